@@ -0,0 +1,17 @@
+-- Migration: Add canonical_url column to car_listings table
+-- Description: Tracking-parameter-free listing URL so the Facebook scraper can match
+-- existing listings with an index lookup instead of a LIKE scan over url
+
+ALTER TABLE car_listings ADD COLUMN IF NOT EXISTS canonical_url VARCHAR;
+
+-- Backfill Facebook listings (same result as normalize_facebook_url)
+UPDATE car_listings
+SET canonical_url = 'https://www.facebook.com/marketplace/item/' || substring(url from '/marketplace/item/(\d+)') || '/'
+WHERE source = 'Facebook Marketplace' AND canonical_url IS NULL AND url ~ '/marketplace/item/\d+';
+
+UPDATE car_listings
+SET canonical_url = url
+WHERE source = 'Facebook Marketplace' AND canonical_url IS NULL;
+
+-- Not unique: older Facebook rows can share an item ID (see check_facebook_duplicates.py)
+CREATE INDEX IF NOT EXISTS idx_car_listings_source_canonical_url ON car_listings(source, canonical_url);
@@ -53,6 +53,7 @@ class CarListing(Base):
     price = Column(BigInteger)
     kilometers = Column(BigInteger)
     url = Column(String, unique=True)
+    canonical_url = Column(String, nullable=True)  # Tracking-free URL (Facebook: .../marketplace/item/<id>/)
     description = Column(String)
     scraped_at = Column(DateTime)
     is_active = Column(Boolean, nullable=False, default=True)
@@ -61,6 +62,11 @@ class CarListing(Base):
     display_make = Column(String, nullable=True)  # Pretty formatted make: "Land Rover"
     display_name = Column(String, nullable=True)  # Pretty formatted model: "Range Rover Sport"
 
+    __table_args__ = (
+        # Same index as db/migrations/add_canonical_url_column.sql
+        Index("idx_car_listings_source_canonical_url", "source", "canonical_url"),
+    )
+
 
 # --- Reference prices (used by deal checker) ---
 # Aggregate stats by normalized make + model_base (nullable to allow make-only rows).
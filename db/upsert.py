@@ -0,0 +1,67 @@
+"""
+Batched INSERT ... ON CONFLICT upserts for car_listings (PostgreSQL or SQLite).
+"""
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from db.models import CarListing
+
+# Fields refreshed on conflict. A None in the batch never overwrites a stored value,
+# and scraped_at is only bumped when one of these actually changed.
+UPSERT_FIELDS = ("price", "kilometers", "title", "make", "model", "year", "image_url")
+
+# Keeps each statement well under PostgreSQL's bind parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+
+def upsert_listings(session: Session, rows: list[dict]) -> tuple[int, int]:
+    """
+    Insert or update listings keyed by url with one statement per chunk.
+    Every row must carry the same keys (url and scraped_at included).
+    Returns (new_listings, updated_listings); rows that did not change are not counted.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement - keep the last card per URL
+    rows = list({row["url"]: row for row in rows}.values())
+
+    table = CarListing.__table__
+    postgres = session.get_bind().dialect.name == "postgresql"
+    insert = postgresql.insert if postgres else sqlite.insert
+    new_listings = 0
+    updated_listings = 0
+
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+        stmt = insert(CarListing).values(chunk)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.url],
+            set_={
+                **{field: func.coalesce(excluded[field], table.c[field]) for field in UPSERT_FIELDS},
+                "scraped_at": excluded.scraped_at,
+            },
+            where=or_(*(
+                and_(excluded[field].isnot(None), excluded[field].is_distinct_from(table.c[field]))
+                for field in UPSERT_FIELDS
+            )),
+        )
+
+        if postgres:
+            # xmax is 0 for freshly inserted tuples; unchanged rows are filtered out by the WHERE
+            stmt = stmt.returning(literal_column("xmax = 0").label("inserted"))
+            for (inserted,) in session.execute(stmt):
+                if inserted:
+                    new_listings += 1
+                else:
+                    updated_listings += 1
+        else:
+            # SQLite has no xmax: look up which URLs are already stored, then the row
+            # count (inserts plus rows the WHERE let through) gives the updates
+            urls = [row["url"] for row in chunk]
+            existing = set(session.scalars(select(CarListing.url).where(CarListing.url.in_(urls))))
+            inserted = len(urls) - len(existing)
+            changed = session.execute(stmt).rowcount
+            new_listings += inserted
+            updated_listings += changed - inserted
+
+    return new_listings, updated_listings
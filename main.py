@@ -2,6 +2,7 @@ import asyncio
 from scrapers.dealerships.bilasolur_scraper import scrape_bilasolur
 from scrapers.dealerships.bilaland_scraper import scrape_bilaland
 from scrapers.facebook_scraper import scrape_facebook
+from scrapers.common import browser_pool
 from db.reference_price_updater import update_reference_prices
 from deal_checker import check_for_deals
 from analysis.train_price_models import train_and_store
@@ -25,7 +26,7 @@ if __name__ == "__main__":
 
     if choice == "1":
         print("Starting Facebook Marketplace scrape...")
-        asyncio.run(scrape_facebook(max_items=5))
+        browser_pool.run(scrape_facebook(max_items=5))
         check_for_deals()
         print("Scrape finished.")
     elif choice == "2":
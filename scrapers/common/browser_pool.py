@@ -0,0 +1,145 @@
+"""
+One shared Chromium per process (per event loop) that scrapers borrow contexts from.
+
+Set PLAYWRIGHT_CDP_URL (e.g. http://localhost:9222) to attach to an already
+running Chrome over CDP instead of launching a new one.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+CDP_URL_ENV = "PLAYWRIGHT_CDP_URL"
+
+# Sub-resources the scrapers never read. Stylesheets are kept on purpose:
+# innerText line breaks (which the card parsers split on) depend on CSS layout.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+)
+
+_playwright = None
+_browser = None
+_loop = None
+_lock = None
+
+
+def _loop_lock():
+    """Return this event loop's lock, forgetting Playwright objects from an older loop."""
+    global _playwright, _browser, _loop, _lock
+
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        # Playwright objects are bound to the loop that created them; each
+        # asyncio.run() in the CLI gets a fresh browser.
+        _playwright = _browser = None
+        _loop = loop
+        _lock = asyncio.Lock()
+    return _lock
+
+
+async def _start_playwright():
+    """Start Playwright for this loop if needed (call with the loop lock held)."""
+    global _playwright
+    if _playwright is None:
+        _playwright = await async_playwright().start()
+    return _playwright
+
+
+async def get_browser():
+    """Return the shared browser, launching (or connecting) on first use."""
+    global _browser
+
+    async with _loop_lock():
+        if _browser is not None and _browser.is_connected():
+            return _browser
+
+        await _start_playwright()
+
+        cdp_url = os.getenv(CDP_URL_ENV)
+        if cdp_url:
+            print(f"Connecting to shared browser at {cdp_url}...")
+            _browser = await _playwright.chromium.connect_over_cdp(cdp_url)
+        else:
+            _browser = await _playwright.chromium.launch(headless=True)
+        return _browser
+
+
+async def _block_route(route):
+    request = route.request
+    host = urlparse(request.url).hostname or ""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def block_heavy_resources(target):
+    """Abort images/media/fonts and analytics requests on a page or context."""
+    await target.route("**/*", _block_route)
+
+
+@asynccontextmanager
+async def context(**kwargs):
+    """Borrow a fresh BrowserContext from the shared browser; closed on exit."""
+    browser = await get_browser()
+    ctx = await browser.new_context(**kwargs)
+    try:
+        yield ctx
+    finally:
+        await ctx.close()
+
+
+@asynccontextmanager
+async def persistent_context(user_data_dir, **kwargs):
+    """Launch a Chromium bound to an on-disk profile; closed on exit.
+
+    Cookies, local storage and the HTTP cache survive between runs. This is a
+    separate browser from the shared one (Playwright ties a profile to its own launch).
+    """
+    async with _loop_lock():
+        playwright = await _start_playwright()
+    ctx = await playwright.chromium.launch_persistent_context(user_data_dir, headless=True, **kwargs)
+    try:
+        yield ctx
+    finally:
+        await ctx.close()
+
+
+async def close_browser():
+    """Close the shared browser and stop Playwright (call once at shutdown)."""
+    global _playwright, _browser
+    if _browser is not None:
+        try:
+            await _browser.close()
+        except Exception:
+            pass
+        _browser = None
+    if _playwright is not None:
+        try:
+            await _playwright.stop()
+        except Exception:
+            pass
+        _playwright = None
+
+
+def run(coro):
+    """asyncio.run() a top-level coroutine and close the shared browser before its loop ends.
+
+    Playwright objects die with their event loop, so a CLI command that calls
+    asyncio.run() more than once would otherwise leave a Chromium behind each time.
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_browser()
+
+    return asyncio.run(main())
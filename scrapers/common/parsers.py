@@ -0,0 +1,162 @@
+"""
+Text parsers shared by the dealership scrapers (BR, Brimborg).
+Regexes are compiled once at import time.
+"""
+import re
+from datetime import datetime
+
+# Makes as they appear at the start of listing titles (lowercase, hyphens as spaces).
+# Only the multi-word ones change how a title is split, but the full set keeps it obvious.
+KNOWN_MAKES = (
+    "alfa romeo", "aston martin", "audi", "bmw", "byd", "citroen", "citroën", "cupra",
+    "dacia", "dodge", "ds", "fiat", "ford", "honda", "hyundai", "isuzu", "jaguar",
+    "jeep", "kia", "land rover", "lexus", "maxus", "mazda", "mercedes benz", "mg",
+    "mini", "mitsubishi", "nissan", "opel", "peugeot", "polestar", "porsche",
+    "range rover", "renault", "rolls royce", "seat", "skoda", "škoda", "smart",
+    "ssangyong", "subaru", "suzuki", "tesla", "toyota", "volkswagen", "volvo",
+)
+MAKES_SET = frozenset(KNOWN_MAKES)
+
+# Thousands separators and spaces dropped from number strings in one pass
+DIGIT_STRIP = str.maketrans("", "", ". \xa0")
+
+# --- shared -----------------------------------------------------------------
+
+def parse_title(title: str | None, max_model_words: int | None = None) -> tuple[str | None, str | None]:
+    """
+    Split a title into (make, model), keeping multi-word makes together.
+    'Land Rover Discovery Sport' -> ('Land Rover', 'Discovery Sport')
+    'BMW iX xDrive40 M Sport' with max_model_words=3 -> ('BMW', 'iX xDrive40 M')
+    """
+    if not title:
+        return None, None
+
+    parts = title.strip().split()
+    if not parts:
+        return None, None
+
+    make_words = 1
+    if len(parts) > 1 and " ".join(parts[:2]).replace("-", " ").lower() in MAKES_SET:
+        make_words = 2
+
+    make = " ".join(parts[:make_words])
+    model_parts = parts[make_words:]
+    if max_model_words is not None:
+        model_parts = model_parts[:max_model_words]
+    model = " ".join(model_parts) or None
+
+    return make, model
+
+
+# --- BR (br.is) -------------------------------------------------------------
+
+# Price, mileage and month/year (with a bare year as last resort) in one scan.
+# Alternatives are tried in this order at each position, so "29 þ.km." is read
+# as thousands before the plain km pattern gets a chance.
+BR_FIELDS_RE = re.compile(
+    r"kr\.?\s*(?P<price>[\d.]+)"
+    r"|(?P<kmk>\d+)\s*þ"
+    r"|(?P<km>\d+)\s*km"
+    r"|\d{1,2}/(?P<my>\d{4})"
+    r"|\b(?P<year>(?:19|20)\d{2})\b",
+    re.IGNORECASE,
+)
+
+# Kept separate: its lazy .*? would otherwise swallow the matches above
+BR_ARGERD_RE = re.compile(r"Árgerð.*?(\d{4})", re.IGNORECASE | re.DOTALL)
+
+
+def extract_br_fields(text: str) -> tuple[int | None, int | None, int | None]:
+    """
+    Extract (price, kilometers, year) from card text in a single regex pass.
+    Price: 'kr. 7.890.000'. Kilometers: 'Akstur 29 þ.km.' (þ = thousand), else '12000 km'.
+    Year: '4/2022' (month/year), else 'Árgerð ... 2022', else a standalone 19xx/20xx.
+    """
+    price = None
+    km_thousands = None
+    km = None
+    month_year = None
+    bare_year = None
+    seen_price = False
+
+    for m in BR_FIELDS_RE.finditer(text):
+        group = m.lastgroup
+        if group == "price":
+            # Only the first price counts, as before
+            if not seen_price:
+                seen_price = True
+                digits = m.group("price").translate(DIGIT_STRIP)
+                price = int(digits) if digits else None
+        elif group == "kmk":
+            if km_thousands is None:
+                km_thousands = int(m.group("kmk")) * 1000
+        elif group == "km":
+            if km is None:
+                km = int(m.group("km"))
+        elif group == "my":
+            if month_year is None:
+                month_year = int(m.group("my"))
+        elif bare_year is None:
+            bare_year = int(m.group("year"))
+
+    year = month_year
+    if year is None:
+        argerd = BR_ARGERD_RE.search(text)
+        year = int(argerd.group(1)) if argerd else bare_year
+
+    kilometers = km_thousands if km_thousands is not None else km
+    return price, kilometers, year
+
+
+# --- Brimborg ---------------------------------------------------------------
+
+# "Tilboð" (discounted price) wins over the regular "Verð:"
+BRIMBORG_OFFER_RE = re.compile(r"Tilboð[\s:]*?([\d\.\s]+)\s*kr", re.IGNORECASE)
+BRIMBORG_PRICE_RE = re.compile(r"Verð[\s:]*?([\d\.\s]+)\s*kr", re.IGNORECASE)
+BRIMBORG_KM_RE = re.compile(r"Ekinn\s*\(km\):\s*([\d\.\s]+)", re.IGNORECASE)
+BRIMBORG_YEAR_RE = re.compile(r"Árgerð.*?(\d{2})/(\d{4})", re.IGNORECASE | re.DOTALL)
+
+
+def extract_brimborg_price(text: str | None) -> int | None:
+    """
+    From strings like 'Verð:7.990.000 kr.' or 'Tilboð2.990.000 kr.' -> 7990000 or 2990000
+    """
+    if not text:
+        return None
+    text = text.replace("\xa0", " ").replace("&nbsp;", " ")
+    m = BRIMBORG_OFFER_RE.search(text) or BRIMBORG_PRICE_RE.search(text)
+    if m:
+        try:
+            return int(m.group(1).translate(DIGIT_STRIP))
+        except ValueError:
+            return None
+    return None
+
+
+def extract_brimborg_kilometers(text: str | None) -> int | None:
+    """
+    From format like 'Ekinn (km): 26.460' -> 26460
+    """
+    if not text:
+        return None
+    m = BRIMBORG_KM_RE.search(text)
+    if m:
+        try:
+            return int(m.group(1).translate(DIGIT_STRIP))
+        except ValueError:
+            return None
+    return None
+
+
+def extract_brimborg_year(text: str | None) -> int | None:
+    """
+    From format like 'Árgerð (nýskráð): 09/2023' or 'Árgerð (nýskráð):\n09/2023' -> 2023
+    """
+    if not text:
+        return None
+    m = BRIMBORG_YEAR_RE.search(text)
+    if m:
+        year = int(m.group(2))
+        if 1985 <= year <= datetime.utcnow().year + 1:
+            return year
+    return None
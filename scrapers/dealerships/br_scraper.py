@@ -1,102 +1,92 @@
 import asyncio
-import re
 from playwright.async_api import async_playwright, TimeoutError as PwTimeout
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 from db.db_setup import SessionLocal
 from db.models import CarListing
+from db.upsert import upsert_listings
+from scrapers.common import browser_pool
+from scrapers.common.parsers import extract_br_fields, parse_title
 from utils.normalizer import normalize_make, normalize_model, normalize_title, pretty_make, get_display_name
 
 BASE_URL = "https://www.br.is/?make=-1"  # -1 means "all manufacturers"
 
-# --- helpers ---------------------------------------------------------------
+# Listings scraped more recently than this are skipped entirely on incremental runs
+FRESH_TTL_HOURS = 6
 
-def extract_price(text: str) -> int | None:
-    """Extract price from text like 'kr. 7.890.000' or 'Flott verð kr. 6.490.000'"""
-    # Look for pattern like "kr. 7.890.000" or "kr 7.890.000"
-    match = re.search(r'kr\.?\s*([\d.]+)', text, re.IGNORECASE)
-    if match:
-        price_str = match.group(1).replace('.', '')
-        try:
-            return int(price_str)
-        except ValueError:
-            return None
-    return None
-
-
-def extract_kilometers(text: str) -> int | None:
-    """Extract kilometers from text like 'Akstur 29 þ.km.' where þ means thousand"""
-    # Look for pattern like "29 þ.km." or "29 þ km"
-    match = re.search(r'(\d+)\s*þ', text, re.IGNORECASE)
-    if match:
-        try:
-            # þ means thousand, so multiply by 1000
-            return int(match.group(1)) * 1000
-        except ValueError:
-            return None
-    
-    # Also try regular km pattern
-    match = re.search(r'(\d+)\s*km', text, re.IGNORECASE)
-    if match:
-        try:
-            return int(match.group(1))
-        except ValueError:
-            return None
-    
-    return None
+LISTING_LINKS_XPATH = '/html/body/form/div[4]/div/div[3]//a[contains(@href, "CarDetails.aspx")]'
 
+# How long to wait for the infinite scroll to attach more cards before giving up
+SCROLL_WAIT_MS = 1500
 
-def extract_year(text: str) -> int | None:
-    """Extract year from text like '4/2022' (month/year format)"""
-    # Look for month/year pattern like "4/2022" or "12/2020"
-    match = re.search(r'(\d{1,2})/(\d{4})', text)
-    if match:
-        try:
-            return int(match.group(2))  # Return the year part
-        except ValueError:
-            return None
-    
-    # Fallback to standard year pattern
-    match = re.search(r'Árgerð.*?(\d{4})', text, re.IGNORECASE | re.DOTALL)
-    if match:
-        try:
-            return int(match.group(1))
-        except ValueError:
-            return None
-    
-    # Try standalone 4-digit year
-    match = re.search(r'\b(19|20)\d{2}\b', text)
-    if match:
-        try:
-            return int(match.group(0))
-        except ValueError:
-            return None
-    return None
-
-
-def parse_title(title: str) -> tuple[str | None, str | None]:
-    """
-    Parse make and model from title.
-    Example: 'Mercedes-Benz GLC 300' -> ('Mercedes-Benz', 'GLC 300')
-    """
-    parts = title.strip().split(maxsplit=1)
-    if len(parts) >= 2:
-        return parts[0], parts[1]
-    elif len(parts) == 1:
-        return parts[0], None
-    return None, None
+# Scrolls to the bottom and resolves as soon as the listing count grows (or on timeout)
+SCROLL_AND_WAIT_JS = """
+async (timeoutMs) => {
+    const count = () => document.querySelectorAll('a[href*="CarDetails.aspx"]').length;
+    const before = count();
+    window.scrollTo(0, document.body.scrollHeight);
+    await new Promise(resolve => {
+        const observer = new MutationObserver(() => {
+            if (count() > before) {
+                observer.disconnect();
+                resolve();
+            }
+        });
+        observer.observe(document.body, { childList: true, subtree: true });
+        setTimeout(() => { observer.disconnect(); resolve(); }, timeoutMs);
+    });
+    return [before, count()];
+}
+"""
 
+# Runs once in the browser over all listing links and returns plain card data (no element handles)
+CARD_DATA_JS = """
+xpath => {
+    const snapshot = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const links = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) links.push(snapshot.snapshotItem(i));
+    return links.map(a => {
+        const parent = a.parentElement;
+        const grandparent = parent.parentElement;
+        const greatGrandparent = grandparent.parentElement;
+        // Descendant queries are subtree-wide, so one lookup from the card root covers both levels
+        const titleDiv = greatGrandparent.querySelector('div.title-text');
+        const text = el => (el && el.innerText ? el.innerText.trim() : null);
+        const img = greatGrandparent.querySelector('img');
+        return {
+            href: a.getAttribute('href'),
+            linkText: a.innerText,
+            make: titleDiv ? text(titleDiv.querySelector('span.sr-make')) : null,
+            model: titleDiv ? text(titleDiv.querySelector('span.sr-model')) : null,
+            text: [parent.innerText, grandparent.innerText, greatGrandparent.innerText].join('\\n'),
+            image: img ? (img.getAttribute('src') || img.getAttribute('data-src')) : null,
+        };
+    });
+}
+"""
 
 # --- main ------------------------------------------------------------------
 
-async def scrape_br(max_scrolls: int = 20, start_url: str | None = None):
+async def scrape_br(max_scrolls: int = 20, start_url: str | None = None, fresh_ttl_hours: float = FRESH_TTL_HOURS):
     """
     Scrape BR (br.is) used cars listings with infinite scroll.
     Scrolls to load more listings instead of using pagination.
+    Listings whose scraped_at is within fresh_ttl_hours are skipped (0 disables the skip).
     """
     session = SessionLocal()
     new_listings = 0
     updated_listings = 0
+    skipped_fresh = 0
+
+    # Load recently scraped URLs once so unchanged cards can be skipped without parsing
+    fresh_urls = set()
+    if fresh_ttl_hours:
+        cutoff = datetime.utcnow() - timedelta(hours=fresh_ttl_hours)
+        fresh_urls = {
+            u for (u,) in session.query(CarListing.url)
+            .filter(CarListing.source == "BR", CarListing.scraped_at > cutoff)
+            .all()
+        }
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
@@ -119,50 +109,38 @@ async def scrape_br(max_scrolls: int = 20, start_url: str | None = None):
             return
         
         # Scroll to load all listings
-        previous_count = 0
         scroll_count = 0
-        no_change_count = 0
         
         while scroll_count < max_scrolls:
-            # Get current listing count
-            links = await page.query_selector_all('xpath=/html/body/form/div[4]/div/div[3]//a[contains(@href, "CarDetails.aspx")]')
-            current_count = len(links)
+            # Scroll to bottom and wait until new cards are attached (or the timeout fires)
+            before_count, current_count = await page.evaluate(SCROLL_AND_WAIT_JS, SCROLL_WAIT_MS)
             
             print(f"Scroll {scroll_count + 1}/{max_scrolls}: Found {current_count} listings")
             
-            # Check if count has changed
-            if current_count == previous_count:
-                no_change_count += 1
-                if no_change_count >= 3:
-                    print("No new listings loaded after 3 scrolls, stopping")
-                    break
-            else:
-                no_change_count = 0
-            
-            previous_count = current_count
-            
-            # Scroll to bottom
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(2)
+            if current_count <= before_count:
+                print("No new listings loaded after scrolling, stopping")
+                break
             
             scroll_count += 1
         
-        # Get all listing links after scrolling
-        links = await page.query_selector_all('xpath=/html/body/form/div[4]/div/div[3]//a[contains(@href, "CarDetails.aspx")]')
+        # Read every card in a single browser round-trip instead of ~10 CDP calls per card
+        cards = await page.evaluate(CARD_DATA_JS, LISTING_LINKS_XPATH)
         
-        if len(links) == 0:
+        if len(cards) == 0:
             print("No listings found")
             await browser.close()
             session.close()
             return
         
-        print(f"\nProcessing {len(links)} total listings...")
+        print(f"\nProcessing {len(cards)} total listings...")
         
         # Process each listing card
-        for link in links:
+        rows = []
+        now = datetime.utcnow()
+        for card in cards:
             try:
                 # URL
-                href = await link.get_attribute("href")
+                href = card["href"]
                 if href and not href.startswith("http"):
                     # Add missing slash if needed
                     if not href.startswith("/"):
@@ -171,90 +149,36 @@ async def scrape_br(max_scrolls: int = 20, start_url: str | None = None):
                 if not href:
                     continue
                 
-                # Get make and model from the title-text div with specific spans
-                # The div contains span.sr-make and span.sr-model
-                make_text = None
-                model_text = None
-                title = ""
+                # Recently scraped - skip parsing and DB work
+                if href in fresh_urls:
+                    skipped_fresh += 1
+                    continue
                 
-                try:
-                    # Navigate to the card element containing title-text
-                    # The link is inside the card, so go up to find the title-text div
-                    parent = await link.evaluate_handle('el => el.parentElement')
-                    
-                    # Look for div.title-text within the card
-                    title_div = await parent.query_selector('div.title-text')
-                    if not title_div:
-                        # Try searching in parent's parent
-                        grandparent = await link.evaluate_handle('el => el.parentElement.parentElement')
-                        title_div = await grandparent.query_selector('div.title-text')
-                    
-                    if title_div:
-                        # Get make from span.sr-make
-                        make_span = await title_div.query_selector('span.sr-make')
-                        if make_span:
-                            make_text = await make_span.inner_text()
-                            make_text = make_text.strip()
-                        
-                        # Get model from span.sr-model
-                        model_span = await title_div.query_selector('span.sr-model')
-                        if model_span:
-                            model_text = await model_span.inner_text()
-                            model_text = model_text.strip()
-                        
-                        # Combine for full title
-                        if make_text and model_text:
-                            title = f"{make_text} {model_text}"
-                        elif make_text:
-                            title = make_text
-                        elif model_text:
-                            title = model_text
-                except Exception as e:
-                    print(f"Error extracting make/model: {e}")
+                # Make and model come from span.sr-make / span.sr-model inside div.title-text
+                make_text = card["make"] or None
+                model_text = card["model"] or None
+                if make_text and model_text:
+                    title = f"{make_text} {model_text}"
+                else:
+                    title = make_text or model_text or ""
                 
-                # Fallback: if we didn't get title from spans, try the old way
+                # Fallback: if we didn't get title from spans, use the link text
                 if not title:
-                    title_line = await link.inner_text()
+                    title_line = card["linkText"] or ""
                     lines = title_line.split('\n')
                     title = lines[0].strip() if len(lines) > 0 else title_line.strip()
                     title = title.replace('-', ' ')
                 
-                # Get parent container for full card data
-                parent = await link.evaluate_handle('el => el.parentElement')
-                card_text = await parent.inner_text()
-                
-                # Try to get more context from grandparent
-                grandparent = await link.evaluate_handle('el => el.parentElement.parentElement')
-                gp_text = await grandparent.inner_text()
-                
-                # Try great-grandparent for even more context
-                great_grandparent = await link.evaluate_handle('el => el.parentElement.parentElement.parentElement')
-                ggp_text = await great_grandparent.inner_text()
+                # Parent, grandparent and great-grandparent texts combined for extraction
+                full_text = card["text"]
                 
-                # Combine texts for extraction
-                full_text = f"{card_text}\n{gp_text}\n{ggp_text}"
-                
-                # Image URL - look for img in the card
-                image_url = None
-                try:
-                    # Try grandparent first
-                    img = await grandparent.query_selector("img")
-                    if not img:
-                        # Try great-grandparent
-                        img = await great_grandparent.query_selector("img")
-                    if img:
-                        image_url = await img.get_attribute("src")
-                        if not image_url:
-                            image_url = await img.get_attribute("data-src")
-                        if image_url and not image_url.startswith("http"):
-                            image_url = f"https://www.br.is{image_url}"
-                except Exception:
-                    pass
+                # Image URL
+                image_url = card["image"]
+                if image_url and not image_url.startswith("http"):
+                    image_url = f"https://www.br.is{image_url}"
                 
                 # Extract data
-                price = extract_price(full_text)
-                kilometers = extract_kilometers(full_text)
-                year = extract_year(full_text)
+                price, kilometers, year = extract_br_fields(full_text)
                 
                 # Parse make/model - prefer the span values if we got them
                 if make_text and model_text:
@@ -268,62 +192,35 @@ async def scrape_br(max_scrolls: int = 20, start_url: str | None = None):
                 normalized_make = normalize_make(make) if make else None
                 normalized_model = normalize_model(model) if model else None
                 
-                # Check if listing exists
-                existing = session.query(CarListing).filter_by(url=href, source="BR").first()
-                
-                # Upsert
-                if existing:
-                    updated = False
-                    for field, value in {
-                        "price": price,
-                        "kilometers": kilometers,
-                        "title": normalized_title,
-                        "make": normalized_make,
-                        "model": normalized_model,
-                        "year": year,
-                        "url": href,
-                    }.items():
-                        if value is not None and getattr(existing, field) != value:
-                            setattr(existing, field, value)
-                            updated = True
-                    
-                    # Always update image_url if we have one and DB doesn't (or it's different)
-                    if image_url and existing.image_url != image_url:
-                        existing.image_url = image_url
-                        updated = True
-                    
-                    if updated:
-                        existing.scraped_at = datetime.utcnow()
-                        updated_listings += 1
-                else:
-                    car = CarListing(
-                        source="BR",
-                        title=normalized_title,
-                        make=normalized_make,
-                        model=normalized_model,
-                        year=year,
-                        price=price,
-                        kilometers=kilometers,
-                        url=href,
-                        image_url=image_url,
-                        display_make=pretty_make(normalized_make) if normalized_make else None,
-                        display_name=get_display_name(normalized_model) if normalized_model else None,
-                        scraped_at=datetime.utcnow(),
-                    )
-                    session.add(car)
-                    new_listings += 1
+                rows.append({
+                    "source": "BR",
+                    "title": normalized_title,
+                    "make": normalized_make,
+                    "model": normalized_model,
+                    "year": year,
+                    "price": price,
+                    "kilometers": kilometers,
+                    "url": href,
+                    "image_url": image_url or None,
+                    "display_make": pretty_make(normalized_make) if normalized_make else None,
+                    "display_name": get_display_name(normalized_model) if normalized_model else None,
+                    "scraped_at": now,
+                    "is_active": True,
+                })
             
             except Exception as e:
                 print(f"Error processing listing: {e}")
                 continue
         
+        # One INSERT ... ON CONFLICT (url) DO UPDATE instead of a SELECT + write per card
+        new_listings, updated_listings = upsert_listings(session, rows)
         session.commit()
         
         await browser.close()
     
     session.close()
-    print(f"Done. {new_listings} new listings added. {updated_listings} listings updated.")
+    print(f"Done. {new_listings} new listings added. {updated_listings} listings updated. {skipped_fresh} fresh listings skipped.")
 
 
 if __name__ == "__main__":
-    asyncio.run(scrape_br(max_pages=20))
+    browser_pool.run(scrape_br(max_pages=20))
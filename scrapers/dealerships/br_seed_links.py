@@ -1,7 +1,58 @@
 import asyncio
+from urllib.parse import urlencode, urljoin
 from playwright.async_api import async_playwright
 
 BASE_URL = "https://www.br.is/"
+DROPDOWN_XPATH = 'xpath=/html/body/form/nav/div/div[4]/div/div/div/div/div/div[1]/div/div[1]/select'
+SEARCH_BUTTON_XPATH = 'xpath=/html/body/form/nav/div/div[4]/div/div/div/div/div/div[6]/div/input'
+
+# Non-empty <option> value/text pairs of the make dropdown
+OPTIONS_JS = """
+select => Array.from(select.options)
+    .map(o => ({ value: o.getAttribute('value') || '', text: (o.innerText || '').trim() }))
+    .filter(o => o.value && o.text)
+"""
+
+FORM_ACTION_JS = "() => (document.querySelector('form') && document.querySelector('form').getAttribute('action')) || location.pathname"
+
+
+# --- helpers ---
+async def _url_selects_make(page, url: str, value: str) -> bool:
+    """Load a constructed URL once and check the make dropdown reflects it."""
+    try:
+        await page.goto(url, wait_until="domcontentloaded")
+        dropdown = await page.wait_for_selector(DROPDOWN_XPATH, timeout=10000)
+        selected = await dropdown.evaluate("select => select.value")
+        print(f"Validated {url} -> selected make value {selected!r}")
+        return selected == value
+    except Exception as e:
+        print(f"Could not validate {url}: {e}")
+        return False
+
+
+async def _search_each_make(page, option_data: list[dict]) -> list[str]:
+    """Slow path: select each make and press search, recording the resulting URL."""
+    make_urls = []
+    for idx, opt in enumerate(option_data):
+        value = opt['value']
+        text = opt['text']
+        try:
+            print(f"[{idx + 1}/{len(option_data)}] Selecting make: {text} (value: {value})")
+            await page.goto(BASE_URL, wait_until="domcontentloaded")
+            dropdown = await page.wait_for_selector(DROPDOWN_XPATH, timeout=10000)
+            await dropdown.select_option(value=value)
+            search_button = await page.wait_for_selector(SEARCH_BUTTON_XPATH, timeout=10000)
+            await search_button.click()
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=5000)
+            except Exception:
+                await asyncio.sleep(2)
+            print(f"Result URL: {page.url}")
+            make_urls.append(page.url)
+        except Exception as e:
+            print(f"Error processing option '{text}': {e}")
+            continue
+    return make_urls
 
 
 async def discover_br_links():
@@ -18,93 +69,30 @@ async def discover_br_links():
         
         # Get the dropdown at the specified xpath
         try:
-            dropdown = await page.wait_for_selector('xpath=/html/body/form/nav/div/div[4]/div/div/div/div/div/div[1]/div/div[1]/select', timeout=10000)
+            dropdown = await page.wait_for_selector(DROPDOWN_XPATH, timeout=10000)
             print("Found dropdown menu")
         except Exception as e:
             print(f"Could not find dropdown: {e}")
             await browser.close()
             return []
         
-        # Get all option elements
-        options = await dropdown.query_selector_all('option')
-        print(f"Found {len(options)} options in make dropdown")
-        
-        # Get the search button
-        try:
-            search_button = await page.wait_for_selector('xpath=/html/body/form/nav/div/div[4]/div/div/div/div/div/div[6]/div/input', timeout=10000)
-            print("Found search button (Leita)")
-        except Exception as e:
-            print(f"Could not find search button: {e}")
-            await browser.close()
-            return []
-        
-        # First, collect all option values and texts before navigating
-        option_data = []
-        for option in options:
-            try:
-                value = await option.get_attribute('value')
-                text = await option.inner_text()
-                text = text.strip()
-                
-                # Skip empty options
-                if not value or value == "" or not text:
-                    continue
-                    
-                option_data.append({'value': value, 'text': text})
-            except Exception as e:
-                print(f"Error reading option: {e}")
-                continue
-        
+        # Collect all option values/texts in one round-trip
+        option_data = await dropdown.evaluate(OPTIONS_JS)
         print(f"Collected {len(option_data)} valid make options")
         
-        make_urls = []
+        # Build the result URLs directly from the form action + select name
+        # instead of selecting/searching/reloading once per make
+        form_action = await page.evaluate(FORM_ACTION_JS)
+        param_name = await dropdown.get_attribute('name') or "make"
+        make_urls = [
+            urljoin(BASE_URL, f"{form_action}?{urlencode({param_name: opt['value']})}")
+            for opt in option_data
+        ]
         
-        # Now iterate through the collected options
-        for idx, opt in enumerate(option_data):
-            try:
-                value = opt['value']
-                text = opt['text']
-                
-                print(f"[{idx + 1}/{len(option_data)}] Selecting make: {text} (value: {value})")
-                
-                # Re-find the dropdown on each iteration
-                dropdown = await page.wait_for_selector('xpath=/html/body/form/nav/div/div[4]/div/div/div/div/div/div[1]/div/div[1]/select', timeout=10000)
-                
-                # Select the option in the dropdown
-                await dropdown.select_option(value=value)
-                await asyncio.sleep(1)
-                
-                # Re-find the search button
-                search_button = await page.wait_for_selector('xpath=/html/body/form/nav/div/div[4]/div/div/div/div/div/div[6]/div/input', timeout=10000)
-                
-                # Click the search button
-                await search_button.click()
-                print("Clicked search button, waiting for navigation...")
-                
-                # Wait for navigation or a short delay
-                try:
-                    await page.wait_for_load_state("domcontentloaded", timeout=5000)
-                except:
-                    await asyncio.sleep(2)
-                
-                # Get the current URL after search
-                current_url = page.url
-                print(f"Result URL: {current_url}")
-                make_urls.append(current_url)
-                
-                # Go back to base URL for next iteration
-                await page.goto(BASE_URL, wait_until="domcontentloaded")
-                await asyncio.sleep(2)
-                
-            except Exception as e:
-                print(f"Error processing option '{text}': {e}")
-                # Try to recover by going back to base URL
-                try:
-                    await page.goto(BASE_URL, wait_until="domcontentloaded")
-                    await asyncio.sleep(2)
-                except:
-                    pass
-                continue
+        # Validate the URL shape once: the dropdown should come back with the make selected
+        if make_urls and not await _url_selects_make(page, make_urls[0], option_data[0]['value']):
+            print("Constructed URLs did not match the site's behavior, falling back to the search button")
+            make_urls = await _search_each_make(page, option_data)
         
         await browser.close()
         
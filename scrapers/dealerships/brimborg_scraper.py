@@ -1,86 +1,129 @@
 import asyncio
-import re
 from datetime import datetime
 
 from playwright.async_api import async_playwright, TimeoutError as PwTimeout
+from sqlalchemy import bindparam, select
 from db.db_setup import SessionLocal
 from db.models import CarListing
+from scrapers.common import browser_pool
+from scrapers.common.parsers import (
+    extract_brimborg_kilometers,
+    extract_brimborg_price,
+    extract_brimborg_year,
+    parse_title,
+)
 from utils.normalizer import normalize_make, normalize_model, normalize_title, pretty_make, get_display_name
 
 BASE_URL = "https://notadir.brimborg.is/is"
 
+# Built once at import; SQLAlchemy reuses the compiled form for every row.
+# IS NOT DISTINCT FROM keeps filter_by's "None means IS NULL" behavior for the fallback.
+FIND_BY_URL = select(CarListing).where(CarListing.url == bindparam("url")).limit(1)
+FIND_SAME_CAR = select(CarListing).where(
+    CarListing.source == "Brimborg",
+    CarListing.make.is_not_distinct_from(bindparam("make")),
+    CarListing.model.is_not_distinct_from(bindparam("model")),
+    CarListing.year.is_not_distinct_from(bindparam("year")),
+    CarListing.title.is_not_distinct_from(bindparam("title")),
+).limit(1)
+
 # --- helpers ---------------------------------------------------------------
 
-def extract_price(text: str | None) -> int | None:
+def _commit_batch(rows: list[dict]) -> tuple[int, int]:
     """
-    From strings like 'Verð:7.990.000 kr.' or 'Tilboð2.990.000 kr.' -> 7990000 or 2990000
+    Upsert one page of parsed listings and commit.
+    Runs in a worker thread with its own session so the event loop keeps fetching pages.
+    Returns (new_listings, updated_listings).
     """
-    if not text:
-        return None
-    text = text.replace("\xa0", " ").replace("&nbsp;", " ")
-    # Look for "Tilboð" first (discounted price), then "Verð:"
-    m = re.search(r"Tilboð[\s:]*?([\d\.\s]+)\s*kr", text, re.IGNORECASE)
-    if not m:
-        m = re.search(r"Verð[\s:]*?([\d\.\s]+)\s*kr", text, re.IGNORECASE)
-    if m:
-        raw = m.group(1)
-        try:
-            return int(raw.replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    return None
-
+    session = SessionLocal()
+    new_listings = 0
+    updated_listings = 0
+    # One timestamp for the whole page
+    now = datetime.utcnow()
 
-def extract_kilometers(text: str | None) -> int | None:
-    """
-    From format like 'Ekinn (km): 26.460' -> 26460
-    """
-    if not text:
-        return None
-    m = re.search(r"Ekinn\s*\(km\):\s*([\d\.\s]+)", text, re.IGNORECASE)
-    if m:
-        try:
-            return int(m.group(1).replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    return None
+    try:
+        for row in rows:
+            try:
+                href = row["url"]
+                normalized_title = row["title"]
+                normalized_make = row["make"]
+                normalized_model = row["model"]
+                year = row["year"]
+                image_url = row["image_url"]
 
+                # Upsert
+                existing = session.execute(FIND_BY_URL, {"url": href}).scalars().first()
+                
+                if not existing:
+                    # fallback: same car but new URL
+                    existing = session.execute(FIND_SAME_CAR, {
+                        "make": normalized_make,
+                        "model": normalized_model,
+                        "year": year,
+                        "title": normalized_title,
+                    }).scalars().first()
+                
+                if existing:
+                    updated = False
+                    price = row["price"]
+                    kilometers = row["kilometers"]
+                    if price is not None and existing.price != price:
+                        existing.price = price
+                        updated = True
+                    if kilometers is not None and existing.kilometers != kilometers:
+                        existing.kilometers = kilometers
+                        updated = True
+                    if normalized_title is not None and existing.title != normalized_title:
+                        existing.title = normalized_title
+                        updated = True
+                    if normalized_make is not None and existing.make != normalized_make:
+                        existing.make = normalized_make
+                        updated = True
+                    if normalized_model is not None and existing.model != normalized_model:
+                        existing.model = normalized_model
+                        updated = True
+                    if year is not None and existing.year != year:
+                        existing.year = year
+                        updated = True
+                    if existing.url != href:
+                        existing.url = href
+                        updated = True
+                    
+                    # Always update image_url if we have one and DB doesn't (or it's different)
+                    if image_url and existing.image_url != image_url:
+                        existing.image_url = image_url
+                        updated = True
+                    
+                    if updated:
+                        existing.scraped_at = now
+                        updated_listings += 1
+                else:
+                    car = CarListing(
+                        source="Brimborg",
+                        title=normalized_title,
+                        make=normalized_make,
+                        model=normalized_model,
+                        year=year,
+                        price=row["price"],
+                        kilometers=row["kilometers"],
+                        url=href,
+                        image_url=image_url,
+                        display_make=pretty_make(normalized_make) if normalized_make else None,
+                        display_name=get_display_name(normalized_model) if normalized_model else None,
+                        scraped_at=now,
+                    )
+                    session.add(car)
+                    new_listings += 1
+            
+            except Exception as e:
+                print(f"Error saving listing {row.get('url')}: {e}")
+                continue
+        
+        session.commit()
+    finally:
+        session.close()
 
-def extract_year(text: str | None) -> int | None:
-    """
-    From format like 'Árgerð (nýskráð): 09/2023' or 'Árgerð (nýskráð):\n09/2023' -> 2023
-    """
-    if not text:
-        return None
-    # Handle both inline and newline-separated formats
-    m = re.search(r"Árgerð.*?(\d{2})/(\d{4})", text, re.IGNORECASE | re.DOTALL)
-    if m:
-        try:
-            year = int(m.group(2))
-            if 1985 <= year <= datetime.utcnow().year + 1:
-                return year
-        except ValueError:
-            pass
-    return None
-
-
-def parse_title(title: str | None) -> tuple[str | None, str | None]:
-    """
-    Parse title like 'BMW iX xDrive40' -> ('BMW', 'iX xDrive40')
-    or 'Polestar 2 LRDM Pilot Lite' -> ('Polestar', '2 LRDM')
-    """
-    if not title:
-        return None, None
-    
-    parts = title.strip().split()
-    if len(parts) == 0:
-        return None, None
-    
-    make = parts[0]
-    # Take next 1-3 parts as model
-    model = " ".join(parts[1:4]) if len(parts) > 1 else (parts[1] if len(parts) > 1 else None)
-    
-    return make, model
+    return new_listings, updated_listings
 
 
 # --- main ------------------------------------------------------------------
@@ -89,175 +132,143 @@ async def scrape_brimborg(max_pages: int = 20, start_url: str | None = None):
     """
     Scrape Brimborg used cars listings with pagination.
     """
-    session = SessionLocal()
     new_listings = 0
     updated_listings = 0
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        current_page = 1
-        base_url = start_url if start_url else BASE_URL
-        
-        while current_page <= max_pages:
-            print(f"Scraping page {current_page}...")
-            
-            # Build URL with page parameter
-            if current_page == 1:
-                url = base_url
-            else:
-                # Add page query param
-                separator = "&" if "?" in base_url else "?"
-                url = f"{base_url}{separator}page={current_page}"
-            
-            await page.goto(url)
-            
-            # Wait for listings to load
-            try:
-                await page.wait_for_selector('a[href*="/notadir-bilar/bill/"]', timeout=15000)
-                await asyncio.sleep(1)
-            except PwTimeout:
-                print(f"No listings found on page {current_page}")
-                break
-            
-            # Get all listing links
-            links = await page.query_selector_all('a[href*="/notadir-bilar/bill/"]')
-            
-            if len(links) == 0:
-                print(f"No more listings found, stopping at page {current_page}")
+    # Each page's rows are committed by a background worker while the next page loads
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+    async def db_worker():
+        nonlocal new_listings, updated_listings
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await queue.get()
+            if batch is None:
                 break
+            try:
+                added, updated = await loop.run_in_executor(None, _commit_batch, batch)
+            except Exception as e:
+                print(f"Error committing page batch: {e}")
+                continue
+            new_listings += added
+            updated_listings += updated
+
+    db_task = asyncio.create_task(db_worker())
+
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            page = await browser.new_page()
             
-            print(f"Found {len(links)} listings on page {current_page}")
+            current_page = 1
+            base_url = start_url if start_url else BASE_URL
             
-            # Process each listing card
-            for link in links:
+            while current_page <= max_pages:
+                print(f"Scraping page {current_page}...")
+                
+                # Build URL with page parameter
+                if current_page == 1:
+                    url = base_url
+                else:
+                    # Add page query param
+                    separator = "&" if "?" in base_url else "?"
+                    url = f"{base_url}{separator}page={current_page}"
+                
+                await page.goto(url)
+                
+                # Wait for listings to load
                 try:
-                    # URL
-                    href = await link.get_attribute("href")
-                    if href and not href.startswith("http"):
-                        href = f"https://notadir.brimborg.is{href}"
-                    if not href:
-                        continue
-                    
-                    # Get title from link
-                    title_line = await link.inner_text()
-                    title_line = title_line.strip()
-                    
-                    # Get parent container for full card data
-                    # The parent likely contains price, year, km, image
-                    parent = await link.evaluate_handle('el => el.parentElement')
-                    card_text = await parent.inner_text()
-                    
-                    # Try to get more context from grandparent
-                    grandparent = await link.evaluate_handle('el => el.parentElement.parentElement')
-                    gp_text = await grandparent.inner_text()
-                    
-                    # Combine texts for extraction
-                    full_text = f"{title_line}\n{card_text}\n{gp_text}"
-                    
-                    # Image URL - look for img in the card
-                    image_url = None
-                    img_el = await grandparent.query_selector("img")
-                    if img_el:
-                        img_src = await img_el.get_attribute("src")
-                        if img_src and "placeholder" not in img_src.lower():
-                            if img_src.startswith("http"):
-                                image_url = img_src
-                            elif img_src.startswith("/"):
-                                image_url = f"https://notadir.brimborg.is{img_src}"
-                    
-                    # Parse title to extract make and model
-                    make, model = parse_title(title_line)
-                    
-                    # Extract data from full text
-                    year = extract_year(full_text)
-                    kilometers = extract_kilometers(full_text)
-                    price = extract_price(full_text)
-                    
-                    # Normalize
-                    normalized_title = normalize_title(title_line) if title_line else None
-                    normalized_make = normalize_make(make) if make else None
-                    normalized_model = normalize_model(model) if model else None
-                    
-                    # Upsert
-                    existing = session.query(CarListing).filter_by(url=href).first()
-                    
-                    if not existing:
-                        # fallback: same car but new URL
-                        existing = (
-                            session.query(CarListing)
-                            .filter_by(
-                                source="Brimborg",
-                                make=normalized_make,
-                                model=normalized_model,
-                                year=year,
-                                title=normalized_title,
-                            )
-                            .first()
-                        )
-                    
-                    if existing:
-                        updated = False
-                        for field, value in {
-                            "price": price,
-                            "kilometers": kilometers,
-                            "title": normalized_title,
-                            "make": normalized_make,
-                            "model": normalized_model,
-                            "year": year,
-                            "url": href,
-                        }.items():
-                            if value is not None and getattr(existing, field) != value:
-                                setattr(existing, field, value)
-                                updated = True
+                    await page.wait_for_selector('a[href*="/notadir-bilar/bill/"]', timeout=15000)
+                    await asyncio.sleep(1)
+                except PwTimeout:
+                    print(f"No listings found on page {current_page}")
+                    break
+                
+                # Get all listing links
+                links = await page.query_selector_all('a[href*="/notadir-bilar/bill/"]')
+                
+                if len(links) == 0:
+                    print(f"No more listings found, stopping at page {current_page}")
+                    break
+                
+                print(f"Found {len(links)} listings on page {current_page}")
+                
+                # Process each listing card
+                rows = []
+                for link in links:
+                    try:
+                        # URL
+                        href = await link.get_attribute("href")
+                        if href and not href.startswith("http"):
+                            href = f"https://notadir.brimborg.is{href}"
+                        if not href:
+                            continue
+                        
+                        # Get title from link
+                        title_line = await link.inner_text()
+                        title_line = title_line.strip()
+                        
+                        # Get parent container for full card data
+                        # The parent likely contains price, year, km, image
+                        parent = await link.evaluate_handle('el => el.parentElement')
+                        card_text = await parent.inner_text()
+                        
+                        # Try to get more context from grandparent
+                        grandparent = await link.evaluate_handle('el => el.parentElement.parentElement')
+                        gp_text = await grandparent.inner_text()
                         
-                        # Always update image_url if we have one and DB doesn't (or it's different)
-                        if image_url and existing.image_url != image_url:
-                            existing.image_url = image_url
-                            updated = True
+                        # Combine texts for extraction
+                        full_text = f"{title_line}\n{card_text}\n{gp_text}"
                         
-                        if updated:
-                            existing.scraped_at = datetime.utcnow()
-                            updated_listings += 1
-                    else:
-                        car = CarListing(
-                            source="Brimborg",
-                            title=normalized_title,
-                            make=normalized_make,
-                            model=normalized_model,
-                            year=year,
-                            price=price,
-                            kilometers=kilometers,
-                            url=href,
-                            image_url=image_url,
-                            display_make=pretty_make(normalized_make) if normalized_make else None,
-                            display_name=get_display_name(normalized_model) if normalized_model else None,
-                            scraped_at=datetime.utcnow(),
-                        )
-                        session.add(car)
-                        new_listings += 1
+                        # Image URL - look for img in the card
+                        image_url = None
+                        img_el = await grandparent.query_selector("img")
+                        if img_el:
+                            img_src = await img_el.get_attribute("src")
+                            if img_src and "placeholder" not in img_src.lower():
+                                if img_src.startswith("http"):
+                                    image_url = img_src
+                                elif img_src.startswith("/"):
+                                    image_url = f"https://notadir.brimborg.is{img_src}"
+                        
+                        # Parse title to extract make and model
+                        make, model = parse_title(title_line, max_model_words=3)
+                        
+                        rows.append({
+                            "url": href,
+                            "title": normalize_title(title_line) if title_line else None,
+                            "make": normalize_make(make) if make else None,
+                            "model": normalize_model(model) if model else None,
+                            "year": extract_brimborg_year(full_text),
+                            "price": extract_brimborg_price(full_text),
+                            "kilometers": extract_brimborg_kilometers(full_text),
+                            "image_url": image_url,
+                        })
+                    
+                    except Exception as e:
+                        print(f"Error processing listing: {e}")
+                        continue
                 
-                except Exception as e:
-                    print(f"Error processing listing: {e}")
-                    continue
-            
-            session.commit()
-            
-            # Check if we should continue to next page
-            # Brimborg uses URL-based pagination (?page=N)
-            # If we got fewer than 40 listings (typical page size), probably last page
-            if len(links) < 40:
-                print(f"Found only {len(links)} listings, likely last page")
-                break
+                # Hand the page off to the DB worker and move on to the next page
+                await queue.put(rows)
+                
+                # Check if we should continue to next page
+                # Brimborg uses URL-based pagination (?page=N)
+                # If we got fewer than 40 listings (typical page size), probably last page
+                if len(links) < 40:
+                    print(f"Found only {len(links)} listings, likely last page")
+                    break
+                
+                current_page += 1
             
-            current_page += 1
-        
-        await browser.close()
-    
-    session.close()
+            await browser.close()
+    finally:
+        # Flush remaining batches before reporting
+        await queue.put(None)
+        await db_task
+
     print(f"Done. {new_listings} new listings added. {updated_listings} listings updated.")
 
 
 if __name__ == "__main__":
-    asyncio.run(scrape_brimborg(max_pages=20))
+    browser_pool.run(scrape_brimborg(max_pages=20))
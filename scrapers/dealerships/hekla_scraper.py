@@ -2,71 +2,112 @@ import asyncio
 import re
 from datetime import datetime
 
-from playwright.async_api import async_playwright, TimeoutError as PwTimeout
+from playwright.async_api import TimeoutError as PwTimeout
+from sqlalchemy import insert, select, update
 from db.db_setup import SessionLocal
 from db.models import CarListing
+from scrapers.common import browser_pool
+from scrapers.common.parsers import DIGIT_STRIP
 from utils.normalizer import normalize_make, normalize_model, normalize_title, pretty_make, get_display_name
 
 BASE_URL = "https://www.hekla.is/is/bilar/notadir-bilar"
+LISTING_LINK_SELECTOR = 'a[href*="/bilar/notadir-bilar/view/"]'
+
+# Result pages fetched at once, each in its own browser context
+HEKLA_CONCURRENCY = 4
+
+# Commit once this many inserts/updates are pending rather than after every page
+COMMIT_EVERY_ROWS = 200
+
+# Fetched pages allowed to wait for the DB worker before the crawl blocks
+DB_QUEUE_PAGES = 8
+
+# Scrolls the page a viewport at a time so lazy-loaded images hydrate, then back to the top
+EAGER_SCROLL_STEP_MS = 50
+EAGER_SCROLL_JS = """
+async (stepMs) => {
+    const step = window.innerHeight;
+    for (let y = 0; y < document.body.scrollHeight; y += step) {
+        window.scrollTo(0, y);
+        await new Promise(r => setTimeout(r, stepMs));
+    }
+    window.scrollTo(0, 0);
+}
+"""
+
+# Link text, great-grandparent text and image source for every listing in one call,
+# plus whether the pager has a next link (rel=next, or the "Næsta >" link).
+# Great-grandparent has structure: <div class="img"> + <div class="info">
+CARD_DATA_JS = """
+selector => {
+    const cards = Array.from(document.querySelectorAll(selector)).map(a => {
+        const card = a.parentElement.parentElement.parentElement;
+        const img = card.querySelector('div.img img, .img img, img');
+        return {
+            href: a.getAttribute('href'),
+            title: a.innerText,
+            text: card.innerText,
+            image: img ? (img.getAttribute('data-src') || img.getAttribute('srcset') || img.getAttribute('src')) : null,
+        };
+    });
+    const hasNext = !!document.querySelector('a[rel="next"]')
+        || Array.from(document.querySelectorAll('a')).some(a => (a.textContent || '').includes('Næsta'));
+    return { cards, hasNext };
+}
+"""
 
 # --- helpers ---------------------------------------------------------------
 
-def extract_price(text: str | None) -> int | None:
-    """
-    From strings like 'Verð:6.290.000 kr.' or 'Tilboð:11.290.000 kr.' -> 6290000 or 11290000
-    """
-    if not text:
-        return None
-    text = text.replace("\xa0", " ").replace("&nbsp;", " ")
-    # Look for "Tilboð:" first (discounted price), then "Verð:"
-    m = re.search(r"Tilboð:\s*([\d\.\s]+)\s*kr", text, re.IGNORECASE)
-    if not m:
-        m = re.search(r"Verð:\s*([\d\.\s]+)\s*kr", text, re.IGNORECASE)
-    if m:
-        raw = m.group(1)
-        try:
-            return int(raw.replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    return None
+# Everything the card parser needs in one scan of the card text:
+#   price  - "Tilboð: 11.290.000 kr." (discounted) or "Verð: 6.290.000 kr."
+#   year   - a line that is exactly MM.YYYY
+#   km     - the next non-empty line after the year line
+CARD_RE = re.compile(
+    r"Tilboð:\s*(?P<offer>[\d\.\s]+)\s*kr"
+    r"|Verð:\s*(?P<price>[\d\.\s]+)\s*kr"
+    r"|^[ \t]*\d{2}\.(?P<year>\d{4})[ \t]*$(?:\n\s*(?P<km>[^\n]*?)[ \t]*$)?",
+    re.IGNORECASE | re.MULTILINE,
+)
 
 
-def extract_kilometers(text: str | None) -> int | None:
-    """
-    From format like '12.2023/ 20.000/ Rafmagn' -> 20000
-    The second number after / is kilometers
-    """
-    if not text:
+def _to_int(raw: str | None) -> int | None:
+    if not raw:
+        return None
+    try:
+        return int(raw.translate(DIGIT_STRIP))
+    except ValueError:
         return None
-    # Pattern: date/ kilometers/ fuel
-    parts = text.split("/")
-    if len(parts) >= 2:
-        km_part = parts[1].strip()
-        # Remove dots and spaces
-        try:
-            return int(km_part.replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    return None
 
 
-def extract_year(text: str | None) -> int | None:
+def parse_card_text(text: str | None) -> tuple[int | None, int | None, int | None]:
     """
-    From format like '12.2023/ 20.000/ Rafmagn' -> 2023
-    The first part is month.year
+    Card text looks like: Title\nVerð:\nprice kr.\nMM.YYYY\nkilometers\nfuel
+    Returns (price, year, kilometers); the Tilboð price wins over Verð.
     """
     if not text:
-        return None
-    # Pattern: MM.YYYY
-    m = re.search(r"(\d{2})\.(\d{4})", text)
-    if m:
-        try:
-            year = int(m.group(2))
-            if 1985 <= year <= datetime.utcnow().year + 1:
-                return year
-        except ValueError:
-            pass
-    return None
+        return None, None, None
+    text = text.replace("\xa0", " ").replace("&nbsp;", " ")
+
+    offer = price = year = kilometers = None
+    year_seen = False
+
+    for m in CARD_RE.finditer(text):
+        if m.group("offer") is not None:
+            if offer is None:
+                offer = _to_int(m.group("offer"))
+        elif m.group("price") is not None:
+            if price is None:
+                price = _to_int(m.group("price"))
+        elif not year_seen:
+            year_seen = True
+            y = int(m.group("year"))
+            if 1985 <= y <= datetime.utcnow().year + 1:
+                year = y
+                km = _to_int(m.group("km"))
+                if km is not None and 0 < km < 1000000:  # reasonable km range (up to 999,999 km)
+                    kilometers = km
+
+    return (offer if offer is not None else price), year, kilometers
 
 
 def parse_title(title: str | None) -> tuple[str | None, str | None]:
@@ -88,227 +129,375 @@ def parse_title(title: str | None) -> tuple[str | None, str | None]:
     return make, model
 
 
-# --- main ------------------------------------------------------------------
+# --- db --------------------------------------------------------------------
+
+UPDATE_FIELDS = ("price", "kilometers", "title", "make", "model", "year", "url")
+
+
+KNOWN_COLUMNS = (
+    CarListing.id, CarListing.url, CarListing.title, CarListing.make, CarListing.model,
+    CarListing.year, CarListing.price, CarListing.kilometers, CarListing.image_url,
+)
+
 
-async def scrape_hekla(max_pages: int = 20, start_url: str | None = None):
+def load_known_listings(session) -> tuple[dict, dict]:
     """
-    Scrape Hekla used cars listings with pagination.
+    Load every Hekla listing once per scrape.
+    Returns (by_url, by_key) where by_key is keyed on (make, model, year, title)
+    for the "same car, new URL" fallback. Both map to the same plain dicts.
     """
-    session = SessionLocal()
-    new_listings = 0
-    updated_listings = 0
+    by_url = {}
+    by_key = {}
+    for row in session.execute(select(*KNOWN_COLUMNS).where(CarListing.source == "Hekla")):
+        known = dict(row._mapping)
+        by_url[known["url"]] = known
+        by_key.setdefault((known["make"], known["model"], known["year"], known["title"]), known)
+    return by_url, by_key
+
+
+def reload_known_listings(session, by_url: dict, by_key: dict):
+    """Refill the lookup maps in place after a rollback dropped rows they point at."""
+    fresh_by_url, fresh_by_key = load_known_listings(session)
+    by_url.clear()
+    by_url.update(fresh_by_url)
+    by_key.clear()
+    by_key.update(fresh_by_key)
+
+
+def rollback_batch(session, by_url: dict, by_key: dict):
+    """Roll back a failed batch commit and bring the lookup maps back in line with the DB."""
+    session.rollback()
+    reload_known_listings(session, by_url, by_key)
+
+
+def save_page(session, rows: list[dict], by_url: dict, by_key: dict) -> tuple[int, int]:
+    """
+    Write one page of parsed listings with two bulk statements, matching against
+    the maps from load_known_listings (which are kept up to date here).
+    Matching is by URL, falling back to the same car under a new URL.
+    Returns (new_listings, updated_listings).
+    """
+    # Last card wins if the same URL shows up twice on a page
+    rows = list({row["url"]: row for row in rows}.values())
+    if not rows:
+        return 0, 0
+
+    now = datetime.utcnow()
+    to_insert = []
+    to_update = {}
+
+    for row in rows:
+        existing = by_url.get(row["url"]) or by_key.get((row["make"], row["model"], row["year"], row["title"]))
+
+        if existing is None:
+            to_insert.append({
+                "source": "Hekla",
+                **row,
+                "display_make": pretty_make(row["make"]) if row["make"] else None,
+                "display_name": get_display_name(row["model"]) if row["model"] else None,
+                "scraped_at": now,
+            })
+            continue
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+        changed = False
+        values = {}
+        for field in UPDATE_FIELDS:
+            value = row[field]
+            current = existing[field]
+            if value is not None and current != value:
+                changed = True
+                values[field] = value
+            else:
+                values[field] = current
+
+        # Always update image_url if we have one and DB doesn't (or it's different)
+        if row["image_url"] and existing["image_url"] != row["image_url"]:
+            changed = True
+            values["image_url"] = row["image_url"]
+        else:
+            values["image_url"] = existing["image_url"]
+
+        if changed:
+            to_update[existing["id"]] = (existing, values)
+
+    if to_insert:
+        # executemany RETURNING only matches the input order when asked to
+        new_ids = session.scalars(
+            insert(CarListing).returning(CarListing.id, sort_by_parameter_order=True), to_insert
+        ).all()
+        for new_id, values in zip(new_ids, to_insert):
+            known = {column.key: values.get(column.key) for column in KNOWN_COLUMNS}
+            known["id"] = new_id
+            by_url[known["url"]] = known
+            by_key.setdefault((known["make"], known["model"], known["year"], known["title"]), known)
+    if to_update:
+        # ORM bulk UPDATE by primary key (executemany)
+        session.execute(update(CarListing), [
+            {"id": listing_id, **values, "scraped_at": now}
+            for listing_id, (_, values) in to_update.items()
+        ])
+        for existing, values in to_update.values():
+            old_url = existing["url"]
+            existing.update(values)
+            if existing["url"] != old_url:
+                by_url.pop(old_url, None)
+                by_url[existing["url"]] = existing
+
+    return len(to_insert), len(to_update)
+
+
+# --- fetching --------------------------------------------------------------
+
+def page_url(base_url: str, page_number: int) -> str:
+    """Listing URL for a given result page (page 1 is the base URL itself)."""
+    if page_number == 1:
+        return base_url
+    # Check if base_url already has query params
+    separator = "&" if "?" in base_url else "?"
+    return f"{base_url}{separator}page={page_number}"
+
+
+async def fetch_and_extract(context, url: str) -> tuple[list[tuple], bool]:
+    """
+    Load one result page in its own tab and pull out the raw card data.
+    Returns ([(href, title_line, card_text, image_src), ...], has_next_page).
+    """
+    page = await context.new_page()
+    try:
+        await page.goto(url, wait_until="domcontentloaded")
         
-        current_page = 1
-        base_url = start_url if start_url else BASE_URL
+        # Wait for listings to load
+        try:
+            await page.wait_for_selector(LISTING_LINK_SELECTOR, timeout=15000)
+        except PwTimeout:
+            return [], False
         
-        while current_page <= max_pages:
-            print(f"Scraping page {current_page}...")
-            
-            # Build URL with page parameter
-            if current_page == 1:
-                url = base_url
-            else:
-                # Check if base_url already has query params
-                separator = "&" if "?" in base_url else "?"
-                url = f"{base_url}{separator}page={current_page}"
-            
-            await page.goto(url)
-            
-            # Wait for listings to load
-            try:
-                await page.wait_for_selector('a[href*="/bilar/notadir-bilar/view/"]', timeout=15000)
-                await asyncio.sleep(1)
-            except PwTimeout:
-                print(f"No listings found on page {current_page}")
-                break
+        # Step through the page once so lazy images get their real src
+        await page.evaluate(EAGER_SCROLL_JS, EAGER_SCROLL_STEP_MS)
+        
+        data = await page.evaluate(CARD_DATA_JS, LISTING_LINK_SELECTOR)
+        cards = [(c["href"], c["title"], c["text"], c["image"]) for c in data["cards"]]
+        return cards, data["hasNext"]
+    finally:
+        await page.close()
+
+
+def resolve_image_url(img_src: str | None) -> str | None:
+    """Turn the raw data-src/srcset/src value into an absolute image URL."""
+    if not img_src or "placeholder" in img_src.lower():
+        return None
+    # Extract first URL from srcset if necessary
+    if " " in img_src and img_src.strip().startswith("http"):
+        img_src = img_src.split(" ")[0]
+    if img_src.startswith("http"):
+        return img_src
+    if img_src.startswith("/"):
+        return f"https://www.hekla.is{img_src}"
+    return None
+
+
+def build_rows(raw_cards: list[tuple], seen_hrefs: set[str]) -> list[dict]:
+    """
+    Parse and normalize the raw (href, title_line, card_text, image_src) tuples of one page.
+    URLs already in seen_hrefs (repeated cards, or listings that shifted between
+    pages during the crawl) are skipped; new ones are added to it.
+    """
+    rows = []
+    for href, title_line, card_text, img_src in raw_cards:
+        try:
+            # URL from the link element
+            if href and not href.startswith("http"):
+                href = f"https://www.hekla.is{href}"
+            if not href or href in seen_hrefs:
+                continue
+            seen_hrefs.add(href)
             
-            # Get all listing cards - need to get the great-grandparent of each link for full data including images
-            links = await page.query_selector_all('a[href*="/bilar/notadir-bilar/view/"]')
+            title_line = (title_line or "").strip()
+            card_text = card_text or ""
+            image_url = resolve_image_url(img_src)
             
-            if len(links) == 0:
-                print(f"No more listings found, stopping at page {current_page}")
-                break
+            # Parse title
+            # Extract make and model
+            make, model = parse_title(title_line)
             
-            print(f"Found {len(links)} listings on page {current_page}")
+            # Price, year and kilometers in one pass over the card text
+            price, year, kilometers = parse_card_text(card_text)
             
-            # Get great-grandparents (which contain both image and listing data)
-            cards = []
-            for link in links:
-                try:
-                    # Go up 3 levels: link -> parent -> grandparent -> great-grandparent
-                    # Great-grandparent has structure: <div class="img"> + <div class="info">
-                    great_grandparent = await link.evaluate_handle('el => el.parentElement.parentElement.parentElement')
-                    cards.append((link, great_grandparent))
-                except Exception:
-                    continue
+            # Normalize
+            normalized_title = normalize_title(title_line) if title_line else None
+            normalized_make = normalize_make(make) if make else None
+            normalized_model = normalize_model(model) if model else None
             
-            for link, card in cards:
+            rows.append({
+                "url": href,
+                "title": normalized_title,
+                "make": normalized_make,
+                "model": normalized_model,
+                "year": year,
+                "price": price,
+                "kilometers": kilometers,
+                "image_url": image_url,
+            })
+        
+        except Exception as e:
+            print(f"Error processing card: {e}")
+            continue
+    return rows
+
+
+def write_page(session, raw_cards: list[tuple], page_number: int, by_url: dict, by_key: dict, seen_hrefs: set[str]) -> tuple[int, int]:
+    """
+    Parse one page and save it inside a savepoint, so a bad page doesn't discard
+    the pending batch. Runs in an executor thread, driven by the DB worker.
+    """
+    rows = build_rows(raw_cards, seen_hrefs)
+    try:
+        with session.begin_nested():
+            return save_page(session, rows, by_url, by_key)
+    except Exception as e:
+        print(f"Error saving page {page_number}: {e}")
+        # The rolled back rows may already be in the maps - reload them in place
+        reload_known_listings(session, by_url, by_key)
+        return 0, 0
+
+
+async def fetch_batch(contexts: list, base_url: str, page_numbers: list[int]) -> list:
+    """Fetch a batch of result pages, one per context; exceptions are returned, not raised."""
+    print(f"Scraping pages {page_numbers[0]}-{page_numbers[-1]}...")
+    return await asyncio.gather(
+        *[fetch_and_extract(ctx, page_url(base_url, n)) for ctx, n in zip(contexts, page_numbers)],
+        return_exceptions=True,
+    )
+
+
+# --- main ------------------------------------------------------------------
+
+async def scrape_hekla(max_pages: int = 20, start_url: str | None = None, concurrency: int = HEKLA_CONCURRENCY):
+    """
+    Scrape Hekla used cars listings with pagination.
+    Result pages are fetched `concurrency` at a time (one browser context each).
+    Fetched pages are handed to a background DB worker, so parsing/writing never
+    holds up the next downloads.
+    """
+    session = SessionLocal()
+    new_listings = 0
+    updated_listings = 0
+    base_url = start_url if start_url else BASE_URL
+
+    # One SELECT for the whole run instead of lookups per card/page
+    known_by_url, known_by_key = load_known_listings(session)
+    # Every listing URL handled this run, so each one is written at most once
+    seen_hrefs = set()
+
+    # Pages are parsed, saved and committed by a background worker while the crawl continues
+    queue: asyncio.Queue = asyncio.Queue(maxsize=DB_QUEUE_PAGES)
+
+    async def db_worker():
+        nonlocal new_listings, updated_listings
+        loop = asyncio.get_running_loop()
+        pending_new = 0
+        pending_updated = 0
+
+        async def commit_batch():
+            # The session is only ever touched from executor threads, rollback included
+            nonlocal new_listings, updated_listings, pending_new, pending_updated
+            try:
+                await loop.run_in_executor(None, session.commit)
+                new_listings += pending_new
+                updated_listings += pending_updated
+            except Exception as e:
+                print(f"Error committing Hekla batch, discarding {pending_new} new and {pending_updated} updated listings: {e}")
                 try:
-                    # URL from the link element
-                    href = await link.get_attribute("href")
-                    if href and not href.startswith("http"):
-                        href = f"https://www.hekla.is{href}"
-                    if not href:
-                        continue
-                    
-                    # Get title from link
-                    title_line = await link.inner_text()
-                    title_line = title_line.strip()
-                    
-                    # Get full card content from grandparent
-                    card_text = await card.inner_text()
-                    
-                    # --- IMAGE URL FIX ---
-                    image_url = None
-
-                    # Scroll to ensure lazy images load
-                    await card.scroll_into_view_if_needed()
-                    await asyncio.sleep(0.2)
-
-                    # The image is in div.img within the great-grandparent
-                    # Structure: <div class="img"><img src="..."></div>
-                    img_el = await card.query_selector("div.img img, .img img, img")
-
-                    if img_el:
-                        img_src = (
-                            await img_el.get_attribute("data-src")
-                            or await img_el.get_attribute("srcset")
-                            or await img_el.get_attribute("src")
-                        )
-
-                        if img_src and "placeholder" not in img_src.lower():
-                            # Extract first URL from srcset if necessary
-                            if " " in img_src and img_src.strip().startswith("http"):
-                                img_src = img_src.split(" ")[0]
-
-                            if img_src.startswith("http"):
-                                image_url = img_src
-                            elif img_src.startswith("/"):
-                                image_url = f"https://www.hekla.is{img_src}"
-
-                    # Parse title
-                    # Extract make and model
-                    make, model = parse_title(title_line)
-                    
-                    # Parse the card text - format is:
-                    # Title\nVerð:\nprice\nMM.YYYY\nkilometers\nfuel
-                    lines = [l.strip() for l in card_text.split('\n') if l.strip()]
-                    
-                    # Find year and kilometers by their positions
-                    year = None
-                    kilometers = None
-                    year_line_idx = None
-                    
-                    for idx, line in enumerate(lines):
-                        # Find the year line (MM.YYYY format)
-                        if not year and re.match(r'^\d{2}\.\d{4}$', line):
-                            year = extract_year(line)
-                            year_line_idx = idx
-                        # Kilometers is the line immediately after year
-                        elif year_line_idx is not None and idx == year_line_idx + 1:
-                            try:
-                                km_val = int(line.replace(".", "").replace(" ", ""))
-                                if 0 < km_val < 1000000:  # reasonable km range (up to 999,999 km)
-                                    kilometers = km_val
-                                    break
-                            except ValueError:
-                                pass
-                    
-                    # Extract price
-                    price = extract_price(card_text)
-                    
-                    # Normalize
-                    normalized_title = normalize_title(title_line) if title_line else None
-                    normalized_make = normalize_make(make) if make else None
-                    normalized_model = normalize_model(model) if model else None
-                    
-                    # Upsert
-                    existing = session.query(CarListing).filter_by(url=href).first()
-                    
-                    if not existing:
-                        # fallback: same car but new URL
-                        existing = (
-                            session.query(CarListing)
-                            .filter_by(
-                                source="Hekla",
-                                make=normalized_make,
-                                model=normalized_model,
-                                year=year,
-                                title=normalized_title,
-                            )
-                            .first()
-                        )
-                    
-                    if existing:
-                        updated = False
-                        for field, value in {
-                            "price": price,
-                            "kilometers": kilometers,
-                            "title": normalized_title,
-                            "make": normalized_make,
-                            "model": normalized_model,
-                            "year": year,
-                            "url": href,
-                        }.items():
-                            if value is not None and getattr(existing, field) != value:
-                                setattr(existing, field, value)
-                                updated = True
-                        
-                        # Always update image_url if we have one and DB doesn't (or it's different)
-                        if image_url and existing.image_url != image_url:
-                            existing.image_url = image_url
-                            updated = True
-                        
-                        if updated:
-                            existing.scraped_at = datetime.utcnow()
-                            updated_listings += 1
-                    else:
-                        car = CarListing(
-                            source="Hekla",
-                            title=normalized_title,
-                            make=normalized_make,
-                            model=normalized_model,
-                            year=year,
-                            price=price,
-                            kilometers=kilometers,
-                            url=href,
-                            image_url=image_url,
-                            display_make=pretty_make(normalized_make) if normalized_make else None,
-                            display_name=get_display_name(normalized_model) if normalized_model else None,
-                            scraped_at=datetime.utcnow(),
-                        )
-                        session.add(car)
-                        new_listings += 1
-                
+                    await loop.run_in_executor(None, rollback_batch, session, known_by_url, known_by_key)
                 except Exception as e:
-                    print(f"Error processing card: {e}")
-                    continue
+                    print(f"Error rolling back Hekla batch: {e}")
+            pending_new = pending_updated = 0
+
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            page_number, raw_cards = item
+            # Never leave the loop early: the crawl blocks on queue.put() once nothing drains it
+            try:
+                added, updated = await loop.run_in_executor(
+                    None, write_page, session, raw_cards, page_number, known_by_url, known_by_key, seen_hrefs
+                )
+            except Exception as e:
+                print(f"Error writing page {page_number}: {e}")
+                continue
+            pending_new += added
+            pending_updated += updated
+            if pending_new + pending_updated >= COMMIT_EVERY_ROWS:
+                await commit_batch()
+        await commit_batch()
+
+    db_task = asyncio.create_task(db_worker())
+
+    # Contexts come from the shared browser; only they are closed here
+    browser = await browser_pool.get_browser()
+    contexts = [await browser.new_context() for _ in range(max(1, concurrency))]
+    for ctx in contexts:
+        await browser_pool.block_heavy_resources(ctx)
+    
+    def batch_pages(first: int) -> list[int]:
+        return list(range(first, min(first + len(contexts), max_pages + 1)))
+    
+    next_fetch = None
+    
+    try:
+        page_numbers = batch_pages(1)
+        next_fetch = asyncio.create_task(fetch_batch(contexts, base_url, page_numbers)) if page_numbers else None
+        done = False
+        
+        while next_fetch is not None and not done:
+            results = await next_fetch
+            next_fetch = None
             
-            session.commit()
+            # Start downloading the next batch right away; it is thrown away
+            # if this batch turns out to hold the last page
+            following = batch_pages(page_numbers[-1] + 1)
+            if following:
+                next_fetch = asyncio.create_task(fetch_batch(contexts, base_url, following))
             
-            # Check if there's a next page
-            # Look for pagination - Hekla might use "Næsta >" button
-            try:
-                next_button = await page.query_selector('a:has-text("Næsta")')
-                if not next_button or current_page >= max_pages:
-                    print("Reached last page or max pages")
+            # Queue pages in order and stop at the first empty/last page
+            for page_number, result in zip(page_numbers, results):
+                if isinstance(result, Exception):
+                    print(f"Error loading page {page_number}: {result}")
+                    done = True
                     break
-                current_page += 1
-            except Exception:
-                # If no next button found, try one more page anyway
-                current_page += 1
-                if current_page > max_pages:
+                
+                raw_cards, has_next = result
+                if not raw_cards:
+                    print(f"No more listings found, stopping at page {page_number}")
+                    done = True
                     break
-        
-        await browser.close()
-    
-    session.close()
+                
+                print(f"Found {len(raw_cards)} listings on page {page_number}")
+                await queue.put((page_number, raw_cards))
+                
+                if not has_next:
+                    print("Reached last page or max pages")
+                    done = True
+                    break
+            
+            page_numbers = following
+    finally:
+        if next_fetch is not None:
+            next_fetch.cancel()
+            try:
+                await next_fetch
+            except (asyncio.CancelledError, Exception):
+                pass
+        for ctx in contexts:
+            await ctx.close()
+        # Flush queued pages before reporting
+        await queue.put(None)
+        await db_task
+        session.close()
+
     print(f"Done. {new_listings} new listings added. {updated_listings} listings updated.")
 
 
 if __name__ == "__main__":
-    asyncio.run(scrape_hekla(max_pages=20))
+    browser_pool.run(scrape_hekla(max_pages=20))
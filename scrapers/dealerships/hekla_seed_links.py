@@ -3,8 +3,9 @@ Discover Hekla make-specific search URLs from the dropdown menu.
 This script navigates to the Hekla used cars page, opens the make dropdown,
 and collects all unique search URLs for each make.
 """
-import asyncio
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PwTimeout
+
+from scrapers.common import browser_pool
 
 BASE_URL = "https://www.hekla.is/is/bilar/notadir-bilar"
 DROPDOWN_XPATH = "/html/body/div[1]/div[2]/div[1]/div/main/div[2]/div/div[1]/div/form/fieldset[1]/div/div[1]/span/select"
@@ -16,34 +17,31 @@ async def discover_hekla_links():
     """
     discovered_urls = []
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+    async with browser_pool.context() as ctx:
+        await browser_pool.block_heavy_resources(ctx)
+        page = await ctx.new_page()
         
         print(f"Navigating to {BASE_URL}...")
-        await page.goto(BASE_URL)
-        
-        # Wait for the page to load
-        await asyncio.sleep(2)
+        await page.goto(BASE_URL, wait_until="domcontentloaded")
         
         try:
-            # Find the dropdown using xpath
-            dropdown = await page.query_selector(f'xpath={DROPDOWN_XPATH}')
+            # Wait for the dropdown itself instead of a fixed sleep
+            try:
+                dropdown = await page.wait_for_selector(f'xpath={DROPDOWN_XPATH}', timeout=10000)
+            except PwTimeout:
+                dropdown = None
             
             if not dropdown:
                 print("Dropdown not found!")
-                await browser.close()
                 return discovered_urls
             
-            # Get all options from the dropdown
-            options = await dropdown.query_selector_all('option')
+            # Get all option value/text pairs from the dropdown in one call
+            options = await dropdown.evaluate(
+                "select => Array.from(select.options).map(o => [o.getAttribute('value'), o.innerText])"
+            )
             print(f"Found {len(options)} options in the make dropdown")
             
-            for option in options:
-                # Get the value attribute (which should contain the make filter)
-                value = await option.get_attribute('value')
-                text = await option.inner_text()
-                
+            for value, text in options:
                 # Skip empty or "All" options
                 if not value or value == "" or value == "0":
                     print(f"Skipping option: {text} (value: {value})")
@@ -58,8 +56,6 @@ async def discover_hekla_links():
             
         except Exception as e:
             print(f"Error discovering links: {e}")
-        
-        await browser.close()
     
     print(f"\n=== Discovered {len(discovered_urls)} unique make URLs ===")
     for url in discovered_urls:
@@ -69,7 +65,7 @@ async def discover_hekla_links():
 
 
 if __name__ == "__main__":
-    urls = asyncio.run(discover_hekla_links())
+    urls = browser_pool.run(discover_hekla_links())
     
     # Save to file
     if urls:
@@ -2,15 +2,104 @@ import asyncio
 import re
 from datetime import datetime
 
-from playwright.async_api import async_playwright, TimeoutError as PwTimeout
+import aiohttp
+from bs4 import BeautifulSoup
+from playwright.async_api import TimeoutError as PwTimeout
+from sqlalchemy import update
+
 from db.db_setup import SessionLocal
 from db.models import CarListing
+from db.upsert import UPSERT_FIELDS, upsert_listings
+from scrapers.common import browser_pool
+from scrapers.common.parsers import DIGIT_STRIP
 from utils.normalizer import normalize_make, normalize_model, normalize_title
 
 BASE_URL = "https://islandsbilar.is/soluskra/"
 
+LISTING_LINK_SELECTOR = 'a[href*="/car/"]'
+
+# Result pages fetched at once after page 1 (tabs of one shared browser context)
+ISLANDSBILAR_CONCURRENCY = 3
+VIEWPORT = {"width": 1280, "height": 900}
+
+# Plain HTTP fetches (no browser) when the listings are in the server-rendered HTML
+HTTP_TIMEOUT_SECONDS = 20
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"}
+
+# Highest page number shown in the pager (1 when there is no pager)
+PAGE_COUNT_JS = """
+() => Math.max(1, ...Array.from(document.querySelectorAll('main ul li'))
+    .map(li => parseInt((li.innerText || '').trim(), 10))
+    .filter(n => !isNaN(n)))
+"""
+
+# href, text and first .card image (src preferred over data-src) for every listing in one call.
+# The image comes back as an absolute URL (same rules as resolve_image_url), placeholders as null.
+CARD_DATA_JS = """
+selector => Array.from(document.querySelectorAll(selector)).map(a => {
+    const card = a.closest('.card');
+    const img = card ? card.querySelector('img') : null;
+    const src = img ? (img.getAttribute('src') || img.getAttribute('data-src')) : null;
+    let image = null;
+    if (src && !src.toLowerCase().includes('placeholder')) {
+        image = src.startsWith('http') ? src
+            : src.startsWith('/') ? 'https://islandsbilar.is' + src
+            : 'https://assets.mango.is/' + src;
+    }
+    return {href: a.getAttribute('href'), text: a.innerText, image};
+})
+"""
+
+# True once every card's image has a src or data-src
+IMAGES_READY_JS = """
+selector => Array.from(document.querySelectorAll(selector)).every(a => {
+    const card = a.closest('.card');
+    const img = card ? card.querySelector('img') : null;
+    return !img || img.getAttribute('src') || img.getAttribute('data-src');
+})
+"""
+
+# First listing href, used to tell when a pager click has swapped the results
+FIRST_HREF_JS = """
+selector => {
+    const a = document.querySelector(selector);
+    return a ? a.getAttribute('href') : null;
+}
+"""
+PAGE_CHANGED_JS = """
+([selector, previous]) => {
+    const a = document.querySelector(selector);
+    return !!a && a.getAttribute('href') !== previous;
+}
+"""
+
 # --- helpers ---------------------------------------------------------------
 
+# Page text casing is fixed ("Verð", "kr.", "km."), so none of these need IGNORECASE
+PRICE_RE = re.compile(r"(?:Verð|Tilboð):\s*([\d\.\s]+)\s*kr")
+PRICE_FALLBACK_RE = re.compile(r"(\d[\d\.\s]+)")
+YEAR_STD_RE = re.compile(r"\b(20[0-3]\d|19[89]\d)\b")
+# "... 7/2020 181 000 km. ..." -> mileage right after the year
+KM_INLINE_RE = re.compile(r"\d{4}\s+([\d\s\.]+)\s*km\.")
+# One pass over a card's collapsed text:
+#   year   - "7/2020", optionally followed by the mileage "181 000 km."
+#   price  - "Verð: 8.590.000 kr." or "Tilboð: 790.000 kr."
+# The title is everything before the first month/year.
+CARD_RE = re.compile(
+    r"\d{1,2}/(?P<year>\d{4})(?:\s+(?P<km>[\d\s\.]+?)\s*km\.)?"
+    r"|(?:Verð|Tilboð):\s*(?P<price>[\d\.\s]+)\s*kr"
+)
+
+
+def _to_int(raw: str | None) -> int | None:
+    if not raw:
+        return None
+    try:
+        return int(raw.translate(DIGIT_STRIP))
+    except ValueError:
+        return None
+
+
 def extract_price(text: str | None) -> int | None:
     """
     From strings like 'Verð: 8.590.000 kr.' or 'Tilboð: 790.000 kr. 890.000 kr.' -> 8590000 or 790000
@@ -18,278 +107,417 @@ def extract_price(text: str | None) -> int | None:
     if not text:
         return None
     text = text.replace("\xa0", " ").replace("&nbsp;", " ")
-    # Look for "Verð:" or "Tilboð:" followed by number
-    m = re.search(r"(?:Verð|Tilboð):\s*([\d\.\s]+)\s*kr", text, re.IGNORECASE)
-    if m:
-        raw = m.group(1)
+    # Look for "Verð:" or "Tilboð:" followed by number, else take the first big number
+    m = PRICE_RE.search(text) or PRICE_FALLBACK_RE.search(text)
+    return _to_int(m.group(1)) if m else None
+
+
+def parse_card_text(full_text: str, max_year: int) -> tuple[str | None, int | None, int | None, int | None]:
+    """
+    Scan "MAKE MODEL [TRIM] 7/2020 181 000 km. ... Verð: 8.590.000 kr." once.
+    Returns (title, price, year, kilometers); the fallback patterns cover whatever is missing.
+    """
+    title = price = year = kilometers = None
+
+    for m in CARD_RE.finditer(full_text):
+        if m.group("year") is not None:
+            if title is None:
+                title = full_text[:m.start()].strip() or None
+            if year is None:
+                y = int(m.group("year"))
+                if 1985 <= y <= max_year:
+                    year = y
+                    kilometers = _to_int(m.group("km"))
+        elif price is None:
+            price = _to_int(m.group("price"))
+        if year is not None and price is not None:
+            break
+
+    if year is None:
+        # CARD_RE has already tried every month/year, so only the standalone-year fallback is left
+        m = YEAR_STD_RE.search(full_text)
+        if m and 1985 <= int(m.group(1)) <= max_year:
+            year = int(m.group(1))
+    if kilometers is None:
+        km_match = KM_INLINE_RE.search(full_text)
+        kilometers = _to_int(km_match.group(1)) if km_match else None
+    if price is None:
+        price = extract_price(full_text)
+    return title, price, year, kilometers
+
+
+# --- pages -----------------------------------------------------------------
+
+def page_url(page_number: int) -> str:
+    """Result page URL; page 1 is the plain listing URL."""
+    return BASE_URL if page_number == 1 else f"{BASE_URL}?page={page_number}"
+
+
+async def extract_cards(page) -> list[dict]:
+    """Wait for listings on the current page, hydrate lazy images and read every card."""
+    await page.wait_for_selector(LISTING_LINK_SELECTOR, timeout=15000)
+    # Scroll to load lazy images, then wait until every card image has a URL to read
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    try:
+        await page.wait_for_function(IMAGES_READY_JS, arg=LISTING_LINK_SELECTOR, timeout=5000)
+    except PwTimeout:
+        pass
+    return await page.evaluate(CARD_DATA_JS, LISTING_LINK_SELECTOR)
+
+
+async def fetch_page(context, sem: asyncio.Semaphore, page_number: int) -> list[dict]:
+    """Load one result page by URL in a new tab of the shared context (at most `sem` at a time)."""
+    async with sem:
+        page = await context.new_page()
         try:
-            return int(raw.replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    # Fallback: take the first big number
-    m = re.findall(r"(\d[\d\.\s]+)", text)
-    if m:
+            await page.goto(page_url(page_number))
+            return await extract_cards(page)
+        finally:
+            await page.close()
+
+
+async def click_next_page(page) -> bool:
+    """Click the pager's next button; False when there is no enabled next page."""
+    try:
+        # Look for the next page button - it's typically the last pagination item that's not disabled
+        # Using the xpath you provided: /html/body/div[1]/div/div/main/div[1]/div/ul/li[7]
+        next_button = await page.query_selector('xpath=/html/body/div[1]/div/div/main/div[1]/div/ul/li[7]')
+        
+        if not next_button:
+            # Fallback: try to find any "next" button or the last pagination number + 1
+            next_button = await page.query_selector('a[aria-label="Next"]')
+        
+        if not next_button:
+            print("No next button found, stopping")
+            return False
+        
+        # Check if it's not disabled
+        classes = await next_button.get_attribute("class") or ""
+        if "disabled" in classes.lower():
+            print("Next button is disabled, reached last page")
+            return False
+        
+        first_href = await page.evaluate(FIRST_HREF_JS, LISTING_LINK_SELECTOR)
+        await next_button.click()
+        # Wait for the listing grid to be replaced rather than a fixed delay
         try:
-            return int(m[0].replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    return None
+            await page.wait_for_function(
+                PAGE_CHANGED_JS, arg=[LISTING_LINK_SELECTOR, first_href], timeout=10000
+            )
+        except PwTimeout:
+            print("Listings did not change after clicking next, stopping")
+            return False
+        return True
+    except Exception as e:
+        print(f"Error clicking next page: {e}")
+        return False
 
 
-def extract_kilometers(text: str | None) -> int | None:
+async def fetch_pages_browser(max_pages: int, concurrency: int) -> list[list[dict]]:
     """
-    Handles: '181 000 km.' -> 181000
+    Page 1 is loaded normally; the remaining pages (up to the pager's last number)
+    are fetched concurrently by URL. If the site ignores the ?page= parameter,
+    falls back to clicking through the pager one page at a time.
     """
-    if not text:
-        return None
-    t = text.lower().replace("\xa0", " ").replace("&nbsp;", " ")
-    m = re.search(r"([\d\.\s]+)\s*km", t, re.IGNORECASE)
-    if m:
+    pages: list[list[dict]] = []
+
+    async with browser_pool.context(viewport=VIEWPORT) as context:
+        await browser_pool.block_heavy_resources(context)
+        page = await context.new_page()
+        
+        print("Scraping page 1...")
+        await page.goto(BASE_URL)
         try:
-            return int(m.group(1).replace(".", "").replace(" ", ""))
-        except ValueError:
-            return None
-    return None
+            pages.append(await extract_cards(page))
+        except PwTimeout:
+            print("No listings found on page 1")
+        
+        if pages and max_pages > 1:
+            last_page = min(await page.evaluate(PAGE_COUNT_JS), max_pages)
+            
+            other_pages = []
+            if last_page > 1:
+                print(f"Fetching pages 2-{last_page} concurrently...")
+                sem = asyncio.Semaphore(max(1, concurrency))
+                results = await asyncio.gather(
+                    *[fetch_page(context, sem, n) for n in range(2, last_page + 1)],
+                    return_exceptions=True,
+                )
+                for n, result in enumerate(results, start=2):
+                    if isinstance(result, Exception):
+                        print(f"Error loading page {n}: {result}")
+                        break
+                    other_pages.append(result)
+            
+            first_hrefs = {c["href"] for c in pages[0]}
+            if other_pages and {c["href"] for c in other_pages[0]} != first_hrefs:
+                pages.extend(other_pages)
+            else:
+                # ?page= didn't give us a different page - walk the pager instead
+                current_page = 1
+                while current_page < max_pages and await click_next_page(page):
+                    current_page += 1
+                    print(f"Scraping page {current_page}...")
+                    try:
+                        pages.append(await extract_cards(page))
+                    except PwTimeout:
+                        print(f"No listings found on page {current_page}")
+                        break
+    
+    return pages
+
 
+# --- plain HTTP ------------------------------------------------------------
 
-def extract_year(text: str | None) -> int | None:
+def resolve_image_url(img_src: str | None) -> str | None:
+    """Turn a card's src/data-src into an absolute image URL (None for placeholders)."""
+    if not img_src or "placeholder" in img_src.lower():
+        return None
+    if img_src.startswith("http"):
+        return img_src
+    if img_src.startswith("/"):
+        return f"https://islandsbilar.is{img_src}"
+    return f"https://assets.mango.is/{img_src}"
+
+
+def parse_html_cards(html: str) -> tuple[list[dict], int | None]:
     """
-    Extract year from text like '7/2020' or '2020'
+    Server-side equivalent of CARD_DATA_JS + PAGE_COUNT_JS.
+    Returns (cards, last_page_in_pager); the page number is None when the HTML has
+    no server-rendered pager.
     """
-    if not text:
+    soup = BeautifulSoup(html, "html.parser")
+    cards = []
+    for a in soup.select(LISTING_LINK_SELECTOR):
+        card = a.find_parent(class_="card")
+        img = card.find("img") if card else None
+        cards.append({
+            "href": a.get("href"),
+            "text": a.get_text("\n", strip=True),
+            "image": resolve_image_url(img.get("src") or img.get("data-src")) if img else None,
+        })
+    numbers = [int(t) for li in soup.select("main ul li") if (t := li.get_text(strip=True)).isdigit()]
+    return cards, max(numbers, default=None)
+
+
+async def fetch_html(http, sem: asyncio.Semaphore, page_number: int) -> str:
+    async with sem:
+        async with http.get(page_url(page_number)) as resp:
+            resp.raise_for_status()
+            return await resp.text()
+
+
+async def fetch_pages_http(max_pages: int, concurrency: int) -> list[list[dict]] | None:
+    """
+    Fetch result pages without a browser.
+    Returns None when the HTML has no listings or no pager (rendered client-side) or
+    the site ignores ?page=, so the caller can fall back to Playwright.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+    try:
+        async with aiohttp.ClientSession(headers=HTTP_HEADERS, timeout=timeout) as http:
+            print("Fetching page 1 over HTTP...")
+            first_cards, last_page = parse_html_cards(await fetch_html(http, sem, 1))
+            if not first_cards:
+                print("No listings in the raw HTML")
+                return None
+            
+            if last_page is None:
+                if max_pages > 1:
+                    # Without the pager there is no way to tell how many pages exist
+                    print("No pager in the raw HTML")
+                    return None
+                last_page = 1
+            
+            pages = [first_cards]
+            last_page = min(last_page, max_pages)
+            if last_page > 1:
+                print(f"Fetching pages 2-{last_page} over HTTP...")
+                results = await asyncio.gather(
+                    *[fetch_html(http, sem, n) for n in range(2, last_page + 1)],
+                    return_exceptions=True,
+                )
+                for n, result in enumerate(results, start=2):
+                    if isinstance(result, Exception):
+                        print(f"Error loading page {n}: {result}")
+                        break
+                    pages.append(parse_html_cards(result)[0])
+                
+                first_hrefs = {c["href"] for c in first_cards}
+                if len(pages) > 1 and {c["href"] for c in pages[1]} == first_hrefs:
+                    print("?page= is ignored over HTTP")
+                    return None
+            return pages
+    except Exception as e:
+        print(f"HTTP fetch failed: {e}")
         return None
-    # Look for pattern like 'month/year' or just year
-    m = re.search(r"\d{1,2}/(\d{4})", text)
-    if m:
-        try:
-            year = int(m.group(1))
-            if 1985 <= year <= datetime.utcnow().year + 1:
-                return year
-        except ValueError:
-            pass
-    # Fallback: standalone 4-digit year
-    m = re.search(r"\b(20[0-3]\d|19[89]\d)\b", text)
-    if m:
+
+
+def parse_card(card: dict, now: datetime) -> dict | None:
+    """Turn one card's href/text/image into a car_listings row, or None if it is unusable."""
+    # URL
+    link = card["href"]
+    if link and not link.startswith("http"):
+        link = f"https://islandsbilar.is{link}"
+    if not link:
+        return None
+
+    # Get the full text content of the card
+    card_text = card["text"] or ""
+
+    # Image URL - images are in div.card__img--wrapper > div > img.card__img
+    # (already absolute: resolved in CARD_DATA_JS / parse_html_cards)
+    image_url = card["image"]
+
+    # Parse the card text to extract details
+    # Format: "MAKE MODEL [TRIM] month/year kilometers km. Transmission Fuel DriveType Verð: price"
+    # Example: "LAND ROVER DEFENDER HSE 7/2020 181 000 km. Sjálfskipting Dísil Fjórhjóladrif Verð: 8.590.000 kr."
+    # The full text is typically on a single line or concatenated - collapse all whitespace in one pass
+    full_text = " ".join(card_text.split())
+
+    if not full_text:
+        return None
+
+    title_line, price, year, kilometers = parse_card_text(full_text, now.year + 1)
+    if not title_line:
+        # Fallback: take first line
+        title_line = card_text.strip().split("\n", 1)[0].strip()
+
+    # Extract make and model from title
+    title_parts = title_line.split()
+    make = title_parts[0] if title_parts else None
+    model = " ".join(title_parts[1:3]) if len(title_parts) > 1 else (title_parts[1] if len(title_parts) > 1 else None)
+
+    # Normalize
+    normalized_title = normalize_title(title_line) if title_line else None
+    normalized_make = normalize_make(make) if make else None
+    normalized_model = normalize_model(model) if model else None
+
+    return {
+        "source": "Islandsbilar",
+        "url": link,
+        "title": normalized_title,
+        "make": normalized_make,
+        "model": normalized_model,
+        "year": year,
+        "price": price,
+        "kilometers": kilometers,
+        "image_url": image_url,
+        "scraped_at": now,
+    }
+
+
+def load_existing(session) -> tuple[dict, dict]:
+    """
+    Load what is stored for every Islandsbilar listing once per run.
+    Returns (stored, url_by_key): stored maps URL to its UPSERT_FIELDS values and
+    url_by_key maps (make, model, year, title) to a URL.
+    """
+    stored = {}
+    url_by_key = {}
+    columns = [getattr(CarListing, field) for field in UPSERT_FIELDS]
+    for url, *values in session.query(CarListing.url, *columns).filter_by(source="Islandsbilar"):
+        current = dict(zip(UPSERT_FIELDS, values))
+        stored[url] = current
+        url_by_key.setdefault((current["make"], current["model"], current["year"], current["title"]), url)
+    return stored, url_by_key
+
+
+def save_cards(session, cards: list[dict], stored: dict, url_by_key: dict, now: datetime) -> tuple[int, int]:
+    """
+    Parse one page of card data and write it: one upsert for the page, plus a plain
+    UPDATE for each car that is already stored under a different URL.
+    Cards identical to what is stored are dropped before the upsert.
+    stored / url_by_key come from load_existing and are kept up to date here;
+    `now` is the run's timestamp (scraped_at and the newest plausible model year).
+    Returns (new_listings, updated_listings).
+    """
+    rows = []
+    moved = []
+
+    for card in cards:
         try:
-            year = int(m.group(1))
-            if 1985 <= year <= datetime.utcnow().year + 1:
-                return year
-        except ValueError:
-            pass
-    return None
+            row = parse_card(card, now)
+        except Exception as e:
+            print(f"Error processing card: {e}")
+            continue
+        if row is None:
+            continue
+        
+        link = row["url"]
+        current = stored.get(link)
+        if current is not None and all(
+            row[field] is None or row[field] == current[field] for field in UPSERT_FIELDS
+        ):
+            # Unchanged since the last run - the upsert would not touch it either
+            continue
+        
+        key = (row["make"], row["model"], row["year"], row["title"])
+        old_url = url_by_key.get(key)
+        if current is None and old_url is not None and old_url != link:
+            # Same car re-listed under a new URL - move the stored row instead of duplicating it
+            moved.append((old_url, row))
+            current = stored.pop(old_url, None)
+            url_by_key[key] = link
+        else:
+            rows.append(row)
+            url_by_key.setdefault(key, link)
+        # None never overwrites a stored value (same rule as upsert_listings)
+        stored[link] = {
+            field: row[field] if row[field] is not None else (current or {}).get(field)
+            for field in UPSERT_FIELDS
+        }
+
+    new_listings, updated_listings = upsert_listings(session, rows)
+
+    for old_url, row in moved:
+        session.execute(
+            update(CarListing)
+            .where(CarListing.url == old_url)
+            .values({field: value for field, value in row.items() if value is not None and field != "source"})
+        )
+        updated_listings += 1
+
+    return new_listings, updated_listings
 
 
 # --- main ------------------------------------------------------------------
 
-async def scrape_islandsbilar(max_pages: int = 5):
+async def scrape_islandsbilar(max_pages: int = 5, concurrency: int = ISLANDSBILAR_CONCURRENCY):
     """
     Scrape islandsbilar.is listings with pagination.
+    Pages are fetched over plain HTTP when the listings are server-rendered,
+    otherwise through Playwright (see fetch_pages_browser).
     """
     session = SessionLocal()
     new_listings = 0
     updated_listings = 0
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        current_page = 1
-        
-        while current_page <= max_pages:
-            print(f"Scraping page {current_page}...")
-            
-            if current_page == 1:
-                await page.goto(BASE_URL)
-            
-            # Wait for listings to load
-            try:
-                await page.wait_for_selector('a[href*="/car/"]', timeout=15000)
-                # Scroll to load lazy images
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(1)
-            except PwTimeout:
-                print(f"No listings found on page {current_page}")
-                break
-            
-            # Get all listing cards
-            cards = await page.query_selector_all('a[href*="/car/"]')
-            print(f"Found {len(cards)} listings on page {current_page}")
-            
-            imgs = await page.query_selector_all("img.card__img")
-            print(f"Found {len(imgs)} images total")
-
-            for card in cards:
-                try:
-                    # URL
-                    link = await card.get_attribute("href")
-                    if link and not link.startswith("http"):
-                        link = f"https://islandsbilar.is{link}"
-                    if not link:
-                        continue
-                    
-                    # Get the full text content of the card
-                    card_text = await card.inner_text()
-                    
-                    # Image URL - images are in div.card__img--wrapper > div > img.card__img
-                    # There can be up to 5 images, we'll take the first one (or the one with is-active class)
-                    parent = await card.evaluate_handle("node => node.closest('.card')")
-                    img_el = await parent.query_selector("img")
-
-                    image_url = None
-                    if img_el:
-                        img_src = await img_el.get_attribute("src") or await img_el.get_attribute("data-src")
-                        if img_src and "placeholder" not in img_src.lower():
-                            if img_src.startswith("http"):
-                                image_url = img_src
-                            elif img_src.startswith("/"):
-                                image_url = f"https://islandsbilar.is{img_src}"
-                            else:
-                                image_url = f"https://assets.mango.is/{img_src}"
-
-                    # Parse the card text to extract details
-                    # Format: "MAKE MODEL [TRIM] month/year kilometers km. Transmission Fuel DriveType Verð: price"
-                    # Example: "LAND ROVER DEFENDER HSE 7/2020 181 000 km. Sjálfskipting Dísil Fjórhjóladrif Verð: 8.590.000 kr."
-                    lines = [l.strip() for l in card_text.split('\n') if l.strip()]
-                    
-                    if len(lines) < 1:
-                        continue
-                    
-                    # The full text is typically on a single line or concatenated
-                    full_text = " ".join(lines)
-                    
-                    # Extract the title portion (everything before month/year pattern)
-                    # Pattern: find "month/year" and take everything before it
-                    title_match = re.match(r"^(.+?)\s+\d{1,2}/\d{4}", full_text)
-                    if title_match:
-                        title_line = title_match.group(1).strip()
-                    else:
-                        # Fallback: take first line
-                        title_line = lines[0]
-                    
-                    # Extract make and model from title
-                    title_parts = title_line.split()
-                    make = title_parts[0] if title_parts else None
-                    model = " ".join(title_parts[1:3]) if len(title_parts) > 1 else (title_parts[1] if len(title_parts) > 1 else None)
-                    
-                    # Normalize
-                    normalized_title = normalize_title(title_line) if title_line else None
-                    normalized_make = normalize_make(make) if make else None
-                    normalized_model = normalize_model(model) if model else None
-                    
-                    # Extract year (from pattern like "7/2020")
-                    year = extract_year(full_text)
-                    
-                    # Extract kilometers (look for pattern "NUMBER km." - extract only the number before "km")
-                    # Must not include the year digits
-                    km_match = re.search(r'\d{4}\s+([\d\s\.]+)\s*km\.', full_text)
-                    if km_match:
-                        try:
-                            kilometers = int(km_match.group(1).replace(".", "").replace(" ", ""))
-                        except ValueError:
-                            kilometers = None
-                    else:
-                        kilometers = None
-                    
-                    # Extract price (from "Verð:" or "Tilboð:")
-                    price = extract_price(full_text)
-                    
-                    # Upsert
-                    existing = session.query(CarListing).filter_by(url=link).first()
-                    
-                    if not existing:
-                        # fallback: same car but new URL
-                        existing = (
-                            session.query(CarListing)
-                            .filter_by(
-                                source="Islandsbilar",
-                                make=normalized_make,
-                                model=normalized_model,
-                                year=year,
-                                title=normalized_title,
-                            )
-                            .first()
-                        )
-                    
-                    if existing:
-                        updated = False
-                        for field, value in {
-                            "price": price,
-                            "kilometers": kilometers,
-                            "title": normalized_title,
-                            "make": normalized_make,
-                            "model": normalized_model,
-                            "year": year,
-                            "url": link,
-                        }.items():
-                            if value is not None and getattr(existing, field) != value:
-                                setattr(existing, field, value)
-                                updated = True
-                        
-                        # Always update image_url if we have one and DB doesn't (or it's different)
-                        if image_url and existing.image_url != image_url:
-                            existing.image_url = image_url
-                            updated = True
-                        
-                        if updated:
-                            existing.scraped_at = datetime.utcnow()
-                            updated_listings += 1
-                    else:
-                        car = CarListing(
-                            source="Islandsbilar",
-                            title=normalized_title,
-                            make=normalized_make,
-                            model=normalized_model,
-                            year=year,
-                            price=price,
-                            kilometers=kilometers,
-                            url=link,
-                            image_url=image_url,
-                            scraped_at=datetime.utcnow(),
-                        )
-                        session.add(car)
-                        new_listings += 1
-                
-                except Exception as e:
-                    print(f"Error processing card: {e}")
-                    continue
-            
+    pages = await fetch_pages_http(max_pages, concurrency)
+    if pages is None:
+        print("Falling back to the browser...")
+        pages = await fetch_pages_browser(max_pages, concurrency)
+    
+    # DB work stays on this task, after all pages are in: one SELECT, one upsert per page
+    stored, url_by_key = load_existing(session)
+    # One timestamp for the whole run
+    now = datetime.utcnow()
+    for page_number, cards in enumerate(pages, start=1):
+        print(f"Found {len(cards)} listings on page {page_number}")
+        try:
+            added, updated = save_cards(session, cards, stored, url_by_key, now)
             session.commit()
-            
-            # Try to find and click next page button
-            if current_page < max_pages:
-                try:
-                    # Look for the next page button - it's typically the last pagination item that's not disabled
-                    # Using the xpath you provided: /html/body/div[1]/div/div/main/div[1]/div/ul/li[7]
-                    next_button = await page.query_selector('xpath=/html/body/div[1]/div/div/main/div[1]/div/ul/li[7]')
-                    
-                    if not next_button:
-                        # Fallback: try to find any "next" button or the last pagination number + 1
-                        next_button = await page.query_selector('a[aria-label="Next"]')
-                    
-                    if next_button:
-                        # Check if it's not disabled
-                        classes = await next_button.get_attribute("class") or ""
-                        if "disabled" not in classes.lower():
-                            await next_button.click()
-                            await asyncio.sleep(2)  # Wait for new page to load
-                            current_page += 1
-                        else:
-                            print("Next button is disabled, reached last page")
-                            break
-                    else:
-                        print("No next button found, stopping")
-                        break
-                except Exception as e:
-                    print(f"Error clicking next page: {e}")
-                    break
-            else:
-                break
-        
-        await browser.close()
+        except Exception as e:
+            session.rollback()
+            print(f"Error saving page {page_number}: {e}")
+            continue
+        new_listings += added
+        updated_listings += updated
     
     session.close()
     print(f"Done. {new_listings} new listings added. {updated_listings} listings updated.")
 
 
 if __name__ == "__main__":
-    asyncio.run(scrape_islandsbilar(max_pages=5))
+    browser_pool.run(scrape_islandsbilar(max_pages=5))
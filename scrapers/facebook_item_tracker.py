@@ -1,11 +1,46 @@
 """
 Utilities for Facebook Marketplace item ID handling and tracking.
 """
+import os
 import re
+from functools import lru_cache
 from typing import Optional, Set
 from datetime import datetime, timedelta
 
+ITEM_ID_RE = re.compile(r'/marketplace/item/(\d+)')
 
+# Discovery sees the same hrefs on every scroll
+ITEM_ID_CACHE_SIZE = 65536
+
+# Rows fetched per round-trip when streaming ID sets out of the DB
+STREAM_BATCH_SIZE = 1000
+
+# Built on first use and shared by every call below (some run once per listing)
+_engine = None
+_SessionLocal = None
+
+
+def _get_session_factory():
+    """Return the module's sessionmaker, or None when DATABASE_URL is not set."""
+    global _engine, _SessionLocal
+    if _SessionLocal is None:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        
+        DATABASE_URL = os.getenv("DATABASE_URL")
+        if not DATABASE_URL:
+            return None
+        
+        # Convert async URL to sync
+        if "asyncpg" in DATABASE_URL:
+            DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql+psycopg2")
+        
+        _engine = create_engine(DATABASE_URL, echo=False, pool_size=5, pool_pre_ping=True)
+        _SessionLocal = sessionmaker(bind=_engine)
+    return _SessionLocal
+
+
+@lru_cache(maxsize=ITEM_ID_CACHE_SIZE)
 def extract_item_id(url: str) -> Optional[str]:
     """
     Extract Facebook Marketplace item ID from URL.
@@ -24,7 +59,7 @@ def extract_item_id(url: str) -> Optional[str]:
         return None
     
     # Match /marketplace/item/NUMBERS/
-    match = re.search(r'/marketplace/item/(\d+)', url)
+    match = ITEM_ID_RE.search(url)
     if match:
         return match.group(1)
     
@@ -34,41 +69,36 @@ def extract_item_id(url: str) -> Optional[str]:
 def get_scraped_item_ids() -> Set[str]:
     """
     Get set of all Facebook item IDs that have already been scraped.
-    Queries car_listings table and extracts item IDs from URLs.
+    On PostgreSQL the item ID is cut out of each URL in the query (same pattern as
+    ITEM_ID_RE); other databases stream the URLs and use extract_item_id.
     
     Returns:
         Set of item ID strings
     """
-    import os
-    from sqlalchemy import create_engine, select
-    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy import func, select
     from db.models import CarListing
     
     try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        if not DATABASE_URL:
+        Session = _get_session_factory()
+        if Session is None:
             return set()
         
-        # Convert async URL to sync
-        if "asyncpg" in DATABASE_URL:
-            DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql+psycopg2")
-        
-        engine = create_engine(DATABASE_URL, echo=False)
-        Session = sessionmaker(bind=engine)
-        
         with Session() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                # substring(url from pattern) returns the regex's capture group
+                result = session.execute(
+                    select(func.substring(CarListing.url, ITEM_ID_RE.pattern))
+                    .where(CarListing.source == "Facebook Marketplace")
+                    .execution_options(yield_per=STREAM_BATCH_SIZE)
+                )
+                return {item_id for (item_id,) in result if item_id}
+            
             result = session.execute(
                 select(CarListing.url)
                 .where(CarListing.source == "Facebook Marketplace")
+                .execution_options(yield_per=STREAM_BATCH_SIZE)
             )
-            
-            item_ids = set()
-            for (url,) in result.fetchall():
-                item_id = extract_item_id(url)
-                if item_id:
-                    item_ids.add(item_id)
-            
-            return item_ids
+            return {item_id for (url,) in result if (item_id := extract_item_id(url))}
             
     except Exception as e:
         print(f"⚠️  Could not fetch scraped item IDs: {e}")
@@ -83,29 +113,20 @@ def get_rejected_item_ids() -> Set[str]:
     Returns:
         Set of rejected item ID strings
     """
-    import os
-    from sqlalchemy import create_engine, select
-    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy import select
     from db.models import RejectedFacebookItem
     
     try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        if not DATABASE_URL:
+        Session = _get_session_factory()
+        if Session is None:
             return set()
         
-        # Convert async URL to sync
-        if "asyncpg" in DATABASE_URL:
-            DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql+psycopg2")
-        
-        engine = create_engine(DATABASE_URL, echo=False)
-        Session = sessionmaker(bind=engine)
-        
         with Session() as session:
             result = session.execute(
                 select(RejectedFacebookItem.item_id)
+                .execution_options(yield_per=STREAM_BATCH_SIZE)
             )
-            
-            return {item_id for (item_id,) in result.fetchall()}
+            return {item_id for (item_id,) in result}
             
     except Exception as e:
         print(f"⚠️  Could not fetch rejected item IDs: {e}")
@@ -121,41 +142,37 @@ def add_rejected_item(item_id: str, reason: str, notes: Optional[str] = None):
         reason: Rejection reason ('non_vehicle', 'navigation_failed', 'invalid_data')
         notes: Optional additional details
     """
-    import os
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy import func
+    from sqlalchemy.dialects import postgresql, sqlite
     from db.models import RejectedFacebookItem
     
     try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        if not DATABASE_URL:
+        Session = _get_session_factory()
+        if Session is None:
             return
         
-        # Convert async URL to sync
-        if "asyncpg" in DATABASE_URL:
-            DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql+psycopg2")
-        
-        engine = create_engine(DATABASE_URL, echo=False)
-        Session = sessionmaker(bind=engine)
-        
         with Session() as session:
-            # Check if already exists
-            existing = session.query(RejectedFacebookItem).filter_by(item_id=item_id).first()
-            if existing:
-                # Update reason and timestamp
-                existing.reason = reason
-                existing.rejected_at = datetime.utcnow()
-                if notes:
-                    existing.notes = notes
-            else:
-                # Add new
-                rejected = RejectedFacebookItem(
-                    item_id=item_id,
-                    reason=reason,
-                    notes=notes
-                )
-                session.add(rejected)
-            
+            # Insert, or refresh reason and timestamp of an existing rejection (one round-trip).
+            # Both dialects spell it INSERT ... ON CONFLICT DO UPDATE.
+            postgres = session.get_bind().dialect.name == "postgresql"
+            insert = postgresql.insert if postgres else sqlite.insert
+            stmt = insert(RejectedFacebookItem).values(
+                item_id=item_id,
+                reason=reason,
+                notes=notes or None,
+                rejected_at=datetime.utcnow(),
+            )
+            table = RejectedFacebookItem.__table__
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.item_id],
+                set_={
+                    "reason": stmt.excluded.reason,
+                    "rejected_at": stmt.excluded.rejected_at,
+                    # Keep earlier notes when none are given
+                    "notes": func.coalesce(stmt.excluded.notes, table.c.notes),
+                },
+            )
+            session.execute(stmt)
             session.commit()
             
     except Exception as e:
@@ -165,39 +182,49 @@ def add_rejected_item(item_id: str, reason: str, notes: Optional[str] = None):
 def update_last_seen(url: str):
     """
     Update last_seen_at timestamp for a listing URL.
-    Called during discovery when we see the listing is still active on Facebook.
+    Prefer update_last_seen_bulk when there is more than one URL.
     
     Args:
         url: Facebook Marketplace listing URL
     """
-    import os
-    from sqlalchemy import create_engine, update
-    from sqlalchemy.orm import sessionmaker
+    update_last_seen_bulk([url])
+
+
+def update_last_seen_bulk(urls) -> int:
+    """
+    Update last_seen_at for many listing URLs with a single UPDATE.
+    Called at the end of discovery for every listing still active on Facebook.
+    
+    Args:
+        urls: Iterable of Facebook Marketplace listing URLs
+        
+    Returns:
+        Number of listings updated
+    """
+    from sqlalchemy import update
     from db.models import CarListing
     
+    urls = list(set(urls))
+    if not urls:
+        return 0
+    
     try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        if not DATABASE_URL:
-            return
-        
-        # Convert async URL to sync
-        if "asyncpg" in DATABASE_URL:
-            DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql+psycopg2")
-        
-        engine = create_engine(DATABASE_URL, echo=False)
-        Session = sessionmaker(bind=engine)
+        Session = _get_session_factory()
+        if Session is None:
+            return 0
         
         with Session() as session:
-            session.execute(
+            result = session.execute(
                 update(CarListing)
-                .where(CarListing.url == url)
+                .where(CarListing.url.in_(urls))
                 .values(last_seen_at=datetime.utcnow())
             )
             session.commit()
+            return result.rowcount
             
     except Exception as e:
         # Silently fail - not critical
-        pass
+        return 0
 
 
 def mark_old_listings_inactive(days_threshold: int = 7):
@@ -211,23 +238,14 @@ def mark_old_listings_inactive(days_threshold: int = 7):
     Returns:
         Number of listings marked inactive
     """
-    import os
-    from sqlalchemy import create_engine, update, and_
-    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy import update, and_
     from db.models import CarListing
     
     try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        if not DATABASE_URL:
+        Session = _get_session_factory()
+        if Session is None:
             return 0
         
-        # Convert async URL to sync
-        if "asyncpg" in DATABASE_URL:
-            DATABASE_URL = DATABASE_URL.replace("postgresql+asyncpg", "postgresql+psycopg2")
-        
-        engine = create_engine(DATABASE_URL, echo=False)
-        Session = sessionmaker(bind=engine)
-        
         cutoff_date = datetime.utcnow() - timedelta(days=days_threshold)
         
         with Session() as session:
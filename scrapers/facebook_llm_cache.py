@@ -0,0 +1,58 @@
+"""
+On-disk cache of AI extraction results for Facebook listings.
+
+Keyed by a SHA-1 of (title, price_text, description), so a listing whose text
+has not changed since the last run never goes back to the AI provider.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+
+# Opened on first use; extraction runs in worker threads, so access is serialized
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    """Return the module's SQLite connection, creating the table on first use."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+        _conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, json TEXT NOT NULL)")
+        _conn.commit()
+    return _conn
+
+
+def cache_key(title, price_text, description) -> str:
+    """SHA-1 of the listing text the AI sees."""
+    return hashlib.sha1(f"{title}|{price_text}|{description}".encode("utf-8")).hexdigest()
+
+
+def get_cached(key: str) -> Optional[dict]:
+    """Return the stored extraction for key, or None on a miss (or an unreadable cache)."""
+    try:
+        with _lock:
+            row = _get_conn().execute("SELECT json FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache read failed: {e}")
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def put_cached(key: str, data: dict):
+    """Store an extraction result ({} for non-vehicles)."""
+    try:
+        with _lock:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, json) VALUES (?, ?)",
+                (key, json.dumps(data, ensure_ascii=False)),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache write failed: {e}")
@@ -3,29 +3,289 @@ import os
 import random
 import re
 import json
-from datetime import datetime
-from playwright.async_api import async_playwright
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import aiohttp
+try:
+    # Faster parsing of AI answers, Batch API output and page JSON; stdlib json otherwise
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+from playwright.async_api import TimeoutError as PwTimeout
+from sqlalchemy import select, tuple_, update
 from db.db_setup import SessionLocal
 from db.models import CarListing
 from utils.normalizer import normalize_make, normalize_model, normalize_title, pretty_make, get_display_name  # ✅ NEW
-from scrapers.facebook_item_tracker import extract_item_id, add_rejected_item, update_last_seen
+from scrapers.common import browser_pool
+from scrapers.facebook_item_tracker import ITEM_ID_RE, extract_item_id, add_rejected_item, update_last_seen_bulk
+from scrapers.facebook_llm_cache import cache_key, get_cached, put_cached
+
+# Per-listing extraction detail goes to DEBUG (LOG_LEVEL=DEBUG); run progress stays on stdout
+logger = logging.getLogger(__name__)
 
 # Choose AI provider: 'openai' or 'gemini' or 'regex' (no AI)
 AI_PROVIDER = os.getenv("AI_PROVIDER", "openai")  # Default to OpenAI
 
+# Transient failures (navigation timeouts, AI rate limits/5xx) are retried this many
+# times in total, waiting RETRY_BASE_SECONDS * 2**attempt (+ jitter) in between
+RETRY_TRIES = 3
+RETRY_BASE_SECONDS = 0.5
+
 # Initialize AI based on provider
 if AI_PROVIDER == "openai":
     from openai import OpenAI
-    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # The client retries connection errors, 429s and 5xx itself, with exponential backoff
+    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=RETRY_TRIES - 1)
 elif AI_PROVIDER == "gemini":
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
     gemini_model = genai.GenerativeModel("gemini-2.0-flash-exp")
+    GEMINI_RETRY_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
 
 FB_URL = "https://www.facebook.com/marketplace/category/vehicles"
 COOKIES_FILE = "fb_state.json"
+# Persistent browser profile: login, storage and HTTP cache carry over between runs
+FB_PROFILE_DIR = os.getenv("FB_PROFILE_DIR", "fb_profile")
+
+# Listings scraped at once (reused tabs in the profile's browser context)
+FACEBOOK_CONCURRENCY = 4
+
+# Listing page timeouts (ms): fail fast on a dead listing instead of idling
+LISTING_NAV_TIMEOUT_MS = 20000
+LISTING_READY_TIMEOUT_MS = 8000
+
+# Discovery feed scrolling: give up after this many scrolls, or when a scroll
+# adds nothing within the timeout (ms)
+DISCOVERY_MAX_SCROLLS = 20
+DISCOVERY_GROWTH_TIMEOUT_MS = 3000
+DISCOVERY_STATE_JS = """() => [
+    document.body.scrollHeight,
+    document.querySelectorAll('a[href*="/marketplace/item/"]').length,
+]"""
+
+# Listing page selectors. CSS scoped to the main region instead of absolute xpaths,
+# which break whenever Facebook adds a wrapper div.
+LISTING_READY_SELECTOR = 'div[role="main"] h1 span[dir="auto"]'
+LISTING_CONTAINER_SELECTOR = 'div[role="main"]'
+SEE_MORE_SELECTOR = (
+    'div[role="button"]:has-text("See more"), span[role="button"]:has-text("See more"), '
+    'div[role="button"]:has-text("Sjá meira"), span[role="button"]:has-text("Sjá meira")'
+)
+# data-ad-* attributes first (stable), then the generated class names
+DESCRIPTION_SELECTORS = [
+    '[data-ad-comet-preview="message"]',
+    '[data-ad-preview="message"]',
+    'div.xz9dl7a.xn6708d.xsag5q8.x1ye3gou',
+]
+
+# All raw listing fields in one round trip: {title, price, image, description,
+# descriptionJson}, or null before the main region renders. descriptionJson is the
+# still-escaped full description from the inline <script type="application/json">
+# payloads, which needs no "See more" click.
+LISTING_FIELDS_JS = r"""
+(sel) => {
+    const c = document.querySelector(sel.container);
+    if (!c) return null;
+
+    let descriptionJson = null;
+    const re = /"redacted_description":\{"text":"((?:[^"\\]|\\.)*)"/;
+    for (const script of document.querySelectorAll('script[type="application/json"]')) {
+        const text = script.textContent;
+        if (!text.includes('"redacted_description"')) continue;
+        const m = text.match(re);
+        if (m) { descriptionJson = m[1]; break; }
+    }
+
+    const titleEl = c.querySelector('h1 span[dir="auto"]');
+    const priceEl = [...c.querySelectorAll('span')].find(s => /isk|kr/i.test(s.textContent));
+
+    // First description selector that matches, else the whole container
+    let descEl = c;
+    for (const s of sel.description) {
+        const el = c.querySelector(s);
+        if (el) { descEl = el; break; }
+    }
+
+    // Main listing photo, else any Facebook CDN image in the container
+    const imgEl = document.querySelector('img[data-visualcompletion="media-vc-image"]')
+        || c.querySelector('img[src*="scontent"]');
+    const src = imgEl ? imgEl.getAttribute('src') : null;
+
+    return {
+        title: titleEl ? titleEl.innerText : null,
+        price: priceEl ? priceEl.innerText : null,
+        description: descEl.innerText,
+        descriptionJson,
+        image: src && src.startsWith('http') ? src : null,
+    };
+}
+"""
+LISTING_FIELDS_ARG = {
+    "container": LISTING_CONTAINER_SELECTOR,
+    "description": DESCRIPTION_SELECTORS,
+}
+
+# Listings scraped (inserted or changed) this recently are not visited again
+RECENT_SCRAPE_HOURS = 12
+
+# Plain-HTTP listing fetch (no browser): the listing fields are in the page's
+# server-rendered JSON. Anything missing a title falls back to Playwright.
+FACEBOOK_HTTP_CONCURRENCY = 8
+HTTP_TIMEOUT_SECONDS = 20
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept-Language": "is,en;q=0.8",
+}
+JSON_STRING = r'"((?:[^"\\]|\\.)*)"'
+LISTING_JSON_RES = {
+    "title": re.compile(r'"marketplace_listing_title":' + JSON_STRING),
+    "price": re.compile(r'"formatted_price":\{"text":' + JSON_STRING),
+    "description": re.compile(r'"redacted_description":\{"text":' + JSON_STRING),
+    "image": re.compile(r'"listing_photos":\[\{[^\[\]]*?"uri":' + JSON_STRING),
+}
+
+# Listings sent to the AI per request, and the answer budget for each of them
+LLM_BATCH_SIZE = 8
+LLM_TOKENS_PER_LISTING = 100
+# Description characters sent to the AI; make/model/year/mileage are near the top
+LLM_DESCRIPTION_MAX_CHARS = 600
+# Constant part of every OpenAI extraction prompt (the JSON shape comes from the response schema)
+OPENAI_SYSTEM_PROMPT = """You extract vehicle data from Icelandic Facebook Marketplace listings.
+A car part or accessory (e.g. dekk, felgur, varahlutir) is not a vehicle: set is_vehicle false.
+For a complete vehicle give make, model, year (4 digits), price (ISK) and mileage (km).
+Mileage: prefer numbers next to "km", "kílómetrar", "þúsund", "Ekinn" or "Keyrður"; "145 þúsund" is 145000.
+Ignore unrelated numbers like "Joined Facebook in 2023". Use null for anything not stated."""
+# AI requests in flight at once (keeps a large run under the provider's rate limits)
+LLM_CONCURRENCY = 10
+
+# Seconds before an AI call is abandoned (the regex fallback takes over); a batched
+# call gets extra time for each additional listing it has to answer
+LLM_TIMEOUT_SECONDS = 10
+LLM_TIMEOUT_PER_LISTING_SECONDS = 5
+
+# OpenAI Batch API (opt-in): status poll interval, and how long a run waits for the
+# job before cancelling it and extracting the rest realtime
+OPENAI_BATCH_POLL_SECONDS = 30
+OPENAI_BATCH_MAX_WAIT_SECONDS = 30 * 60
+
+# Structured-output schemas: the API guarantees this exact JSON shape
+LISTING_SCHEMA_PROPERTIES = {
+    "is_vehicle": {"type": "boolean"},
+    "make": {"type": ["string", "null"]},
+    "model": {"type": ["string", "null"]},
+    "year": {"type": ["integer", "null"]},
+    "price": {"type": ["integer", "null"]},
+    "mileage": {"type": ["integer", "null"]},
+}
+LISTING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "listing",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": LISTING_SCHEMA_PROPERTIES,
+            "required": list(LISTING_SCHEMA_PROPERTIES),
+            "additionalProperties": False,
+        },
+    },
+}
+LISTING_BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "listings",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "listings": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "integer"}, **LISTING_SCHEMA_PROPERTIES},
+                        "required": ["id", *LISTING_SCHEMA_PROPERTIES],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["listings"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Listings the regex fast path answered without an AI call (process-wide; extraction
+# runs in worker threads, hence the lock)
+llm_skipped = 0
+_llm_skipped_lock = threading.Lock()
+
+# ----- Retries -----
+def backoff_delay(attempt):
+    """Seconds to wait before retry number attempt + 1."""
+    return RETRY_BASE_SECONDS * (2 ** attempt) + random.random() * 0.2
+
+
+async def with_retry(fn, retry_on, tries=RETRY_TRIES):
+    """Await fn(), retrying the transient errors in retry_on with exponential backoff."""
+    for attempt in range(tries):
+        try:
+            return await fn()
+        except retry_on as e:
+            if attempt == tries - 1:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Transient error ({type(e).__name__}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+
+def with_retry_sync(fn, retry_on, tries=RETRY_TRIES):
+    """Blocking twin of with_retry, for the AI clients (they run in worker threads)."""
+    for attempt in range(tries):
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt == tries - 1:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Transient error ({type(e).__name__}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
 
 # ----- Utilities -----
+NUMBER_RE = re.compile(r"\d[\d.,]*")
+# Group 2 is the unit right after the number ("145 þúsund" means 145000)
+MILEAGE_WORD_RE = re.compile(r"(?:ekinn|keyrður)(?:\s+\S+){0,5}?\s*(\d[\d.,]*)\s*(km|kílómetrar|þúsund)?")
+MILEAGE_UNIT_RE = re.compile(r"(\d[\d.,]*)\s*(km|kílómetrar|þúsund)")
+YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+# Common Icelandic car makes, found in a title with one scan. Longest first, so
+# "mercedes-benz" wins over "mercedes" at the same position; whole words only, so
+# "seat" does not match "seats".
+TITLE_MAKES = ["toyota", "volkswagen", "vw", "audi", "bmw", "mercedes", "mercedes-benz", "mercedes benz", "ford",
+               "nissan", "hyundai", "kia", "mazda", "honda", "subaru", "volvo", "skoda", "seat",
+               "peugeot", "citroen", "renault", "opel", "chevrolet", "dodge", "jeep", "land rover",
+               "range rover", "tesla", "lexus", "mitsubishi", "suzuki", "fiat"]
+TITLE_MAKE_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(make) for make in sorted(TITLE_MAKES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+# normalize_make() results the regex-only path may store without asking the AI; a title
+# make that normalizes to anything else (e.g. "citroen") goes to the AI instead
+CANONICAL_TITLE_MAKES = {
+    "toyota", "volkswagen", "audi", "bmw", "mercedes-benz", "ford", "nissan", "hyundai", "kia",
+    "mazda", "honda", "subaru", "volvo", "škoda", "seat", "peugeot", "renault", "opel",
+    "chevrolet", "dodge", "jeep", "land-rover", "range-rover", "tesla", "lexus", "mitsubishi",
+    "suzuki", "fiat",
+}
+# Marketplace chrome that leaks into the description text
+JUNK_LINE_RE = re.compile(r"joined facebook|today's picks|away", re.IGNORECASE)
+
 def extract_number(text):
     if text is None:
         return None
@@ -33,10 +293,10 @@ def extract_number(text):
         return int(text)
     text = str(text)
     # pick the FIRST number (handles "ISK250,000ISK900,000")
-    numbers = re.findall(r"\d[\d.,]*", text)
-    if numbers:
+    match = NUMBER_RE.search(text)
+    if match:
         try:
-            return int(numbers[0].replace(".", "").replace(",", ""))
+            return int(match.group(0).replace(".", "").replace(",", ""))
         except ValueError:
             return None
     return None
@@ -47,16 +307,16 @@ def extract_mileage(text):
     text = str(text).lower()
     # Prefer "Ekinn"/"Keyrður" style but allow intervening words
     # e.g. "Ekinn aðeins 99.000km"
-    match = re.search(r"(?:ekinn|keyrður)(?:\s+\S+){0,5}?\s*(\d[\d.,]*)\s*(?:km|kílómetrar|þúsund)?", text)
+    match = MILEAGE_WORD_RE.search(text)
     if not match:
         # Generic number followed by km (covers '99,503 km', '99.000km', '📍 Mileage: 99,503 km')
-        match = re.search(r"(\d[\d.,]*)\s*(?:km|kílómetrar|þúsund)", text)
+        match = MILEAGE_UNIT_RE.search(text)
     if match:
         raw = match.group(1)
         # Normalize number separators
         value = raw.replace(".", "").replace(",", "")
-        # If the text contains the Icelandic word 'þúsund', interpret as thousands
-        if "þúsund" in text:
+        # 'þúsund' right after the number means thousands
+        if match.group(2) == "þúsund":
             try:
                 return int(value) * 1000
             except ValueError:
@@ -72,11 +332,7 @@ def clean_text(text):
     if not text:
         return ""
     lines = [line.strip() for line in text.splitlines()]
-    filtered = [
-        l for l in lines
-        if l and not any(kw in l.lower() for kw in ["joined facebook", "today's picks", "away"])
-    ]
-    return "\n".join(filtered)
+    return "\n".join(l for l in lines if l and not JUNK_LINE_RE.search(l))
 
 # ----- AI extraction -----
 def is_likely_vehicle(title, price_text, description):
@@ -119,17 +375,19 @@ def extract_structured_data(title, price_text, description, url=None):
     """Extract vehicle data using configured AI provider or regex fallback."""
     
     # Pre-filter: Skip obvious non-vehicles
-    if not is_likely_vehicle(title, price_text, description):
-        print(f"⚠️ SKIPPING: Likely a part/accessory, not a vehicle")
-        
-        # Track this as rejected
-        if url:
-            item_id = extract_item_id(url)
-            if item_id:
-                add_rejected_item(item_id, "non_vehicle", f"Title: {title}")
-        
+    if reject_if_not_vehicle(title, price_text, description, url):
         return {}
     
+    if AI_PROVIDER in ("openai", "gemini"):
+        cached = get_cached(cache_key(title, price_text, description))
+        if cached is not None:
+            logger.debug("♻️ Using cached AI extraction for: %s", title)
+            return cached
+        complete = extract_complete_with_regex(title, price_text, description)
+        if complete:
+            logger.debug("⚡ Regex found every field, skipping AI for: %s", title)
+            return complete
+    
     if AI_PROVIDER == "openai":
         return extract_with_openai(title, price_text, description)
     elif AI_PROVIDER == "gemini":
@@ -139,131 +397,288 @@ def extract_structured_data(title, price_text, description, url=None):
         return extract_with_regex(title, price_text, description)
 
 
-def extract_with_openai(title, price_text, description):
-    """Extract using OpenAI API with structured output."""
-    prompt = f"""Extract vehicle information from this Facebook listing. 
+def reject_if_not_vehicle(title, price_text, description, url=None):
+    """Run the is_likely_vehicle pre-filter; tracks and returns True for parts/accessories."""
+    if is_likely_vehicle(title, price_text, description):
+        return False
+    logger.debug("⚠️ SKIPPING: Likely a part/accessory, not a vehicle: %s", title)
     
-IMPORTANT: If this is a car PART or ACCESSORY (not a complete vehicle), return {{"is_vehicle": false}}.
-
-Common parts/accessories to reject (Icelandic):
-- dekk (tires), felgur (rims), ljós (lights), hurðaspjöld (door panels)
-- pallhús (truck bed cover), hleðslusnúra (charging cable)
-- varahlutir (spare parts), speglar (mirrors), sæti (seats)
-
-Title: {title}
-Price: {price_text}
-Description:
-{description}
-
-Extract ONLY if this is a complete VEHICLE for sale:
-- Make (car manufacturer)
-- Model (car model name)
-- Year (4 digits)
-- Price (numeric, in ISK)
-- Mileage (numeric kilometers)
-
-Rules:
-- Mileage must be a number in kilometers. Prefer numbers followed by "km", "kílómetrar", "þúsund", or words like "Ekinn"/"Keyrður".
-- Ignore unrelated numbers like "Joined Facebook in 2023".
-- If mileage is in thousands (e.g., "145 þúsund"), convert to full number (145000).
-- If no mileage is given, return null.
-- If any field cannot be determined, return null for that field.
-- If this is NOT a vehicle (parts, accessories, etc.), return {{"is_vehicle": false}}
-
-Return ONLY valid JSON:
-{{"is_vehicle": true, "make": "...", "model": "...", "year": 2020, "price": 1500000, "mileage": 145000}}
-OR
-{{"is_vehicle": false}}"""
+    # Track this as rejected
+    if url:
+        item_id = extract_item_id(url)
+        if item_id:
+            add_rejected_item(item_id, "non_vehicle", f"Title: {title}")
+    return True
+
+
+def extract_structured_data_batch(rows):
+    """Extract vehicle data for several listings with one AI call.
     
-    try:
-        # Log input data
-        print("\n" + "="*80)
-        print("🤖 AI EXTRACTION - INPUT DATA")
-        print("="*80)
-        print(f"Title: {title}")
-        print(f"Price Text: {price_text}")
-        print(f"Description (first 200 chars): {description[:200] if description else 'None'}...")
-        print("="*80)
+    Args:
+        rows: dicts with title, price_text, description and url
         
+    Returns:
+        One dict per row, in order ({} for non-vehicles), same shape as extract_structured_data
+    """
+    results = [{} for _ in rows]
+    pending = [
+        i for i, row in enumerate(rows)
+        if not reject_if_not_vehicle(row["title"], row["price_text"], row["description"], row["url"])
+    ]
+    if AI_PROVIDER in ("openai", "gemini"):
+        keys = {i: cache_key(rows[i]["title"], rows[i]["price_text"], rows[i]["description"]) for i in pending}
+        misses = []
+        for i in pending:
+            cached = get_cached(keys[i])
+            if cached is None:
+                misses.append(i)
+            else:
+                results[i] = cached
+        if len(misses) < len(pending):
+            print(f"♻️ Using cached AI extraction for {len(pending) - len(misses)} listings")
+        pending = []
+        for i in misses:
+            complete = extract_complete_with_regex(rows[i]["title"], rows[i]["price_text"], rows[i]["description"])
+            if complete:
+                results[i] = complete
+            else:
+                pending.append(i)
+        if len(pending) < len(misses):
+            print(f"⚡ Regex found every field for {len(misses) - len(pending)} listings, skipping AI for them")
+    if not pending:
+        return results
+    
+    if AI_PROVIDER != "openai" or len(pending) == 1:
+        # Only the OpenAI path has a batched prompt
+        for i in pending:
+            row = rows[i]
+            results[i] = extract_structured_data(row["title"], row["price_text"], row["description"], row["url"])
+        return results
+    
+    listings = "\n\n".join(
+        f"[id {n}]\n{listing_prompt_text(rows[i]['title'], rows[i]['price_text'], rows[i]['description'])}"
+        for n, i in enumerate(pending)
+    )
+    prompt = f"Extract each listing below; answer with one entry per id.\n\n{listings}"
+    
+    by_id = {}
+    try:
+        print(f"🤖 AI EXTRACTION - batch of {len(pending)} listings")
         response = openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "You are a data extraction assistant. Return only valid JSON, no markdown or explanations."},
+                {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0,
-            max_tokens=200,
-            response_format={"type": "json_object"}  # Force JSON output
+            max_tokens=LLM_TOKENS_PER_LISTING * len(pending),
+            response_format=LISTING_BATCH_RESPONSE_FORMAT,
+            timeout=LLM_TIMEOUT_SECONDS + LLM_TIMEOUT_PER_LISTING_SECONDS * (len(pending) - 1),
         )
+        logger.debug("🤖 AI batch prompt tokens: %s", response.usage.prompt_tokens)
+        for item in json_loads(response.choices[0].message.content).get("listings", []):
+            if isinstance(item, dict) and isinstance(item.get("id"), int):
+                by_id[item["id"]] = item
+    except Exception as e:
+        print(f"❌ OpenAI batch extraction failed: {e}")
+    
+    for n, i in enumerate(pending):
+        row = rows[i]
+        data = by_id.get(n)
+        if data is None:
+            # Missing from the answer (or the call failed) - same fallback as a single failed call
+            results[i] = extract_with_regex(row["title"], row["price_text"], row["description"])
+        elif data.pop("is_vehicle", True) is False:
+            logger.debug("🚫 AI CLASSIFIED AS NON-VEHICLE (part/accessory): %s", row["title"])
+            put_cached(keys[i], {})
+        else:
+            data.pop("id", None)
+            results[i] = validate_extracted(data, row["title"], row["description"])
+            put_cached(keys[i], results[i])
+    return results
+
+
+def extract_structured_data_batch_api(rows):
+    """Like extract_structured_data_batch, but sends the listings through the OpenAI
+    Batch API (half price, no per-request round trips) and waits for the job.
+    Anything the job does not answer in OPENAI_BATCH_MAX_WAIT_SECONDS falls back
+    to the realtime path."""
+    results = [{} for _ in rows]
+    pending = []
+    for i, row in enumerate(rows):
+        title, price_text, description = row["title"], row["price_text"], row["description"]
+        if reject_if_not_vehicle(title, price_text, description, row["url"]):
+            continue
+        cached = get_cached(cache_key(title, price_text, description))
+        if cached is None:
+            cached = extract_complete_with_regex(title, price_text, description)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+    
+    # One JSONL line per listing; custom_id is the row index
+    lines = [
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": openai_listing_request(rows[i]["title"], rows[i]["price_text"], rows[i]["description"]),
+        }, ensure_ascii=False)
+        for i in pending
+    ]
+    answers = {}
+    try:
+        batch_file = openai_client.files.create(
+            file=("facebook_listings.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = openai_client.batches.create(
+            input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        print(f"🤖 AI EXTRACTION - submitted batch {batch.id} with {len(pending)} listings")
         
-        text = response.choices[0].message.content.strip()
-        data = json.loads(text)
-        
-        # Log raw AI output
-        print("🤖 AI EXTRACTION - RAW OUTPUT")
-        print("="*80)
-        print(f"Raw JSON: {text}")
-        print("="*80)
-        
-        # Check if AI classified as non-vehicle
-        if data.get("is_vehicle") == False:
-            print("🚫 AI CLASSIFIED AS NON-VEHICLE (part/accessory)")
-            print("="*80 + "\n")
-            return {}
-        
-        # Validate extracted data
-        validation_messages = []
+        deadline = time.monotonic() + OPENAI_BATCH_MAX_WAIT_SECONDS
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() > deadline:
+                print(f"⚠️ Batch {batch.id} still {batch.status} - cancelling, the rest goes realtime")
+                openai_client.batches.cancel(batch.id)
+                break
+            time.sleep(OPENAI_BATCH_POLL_SECONDS)
+            batch = openai_client.batches.retrieve(batch.id)
         
-        if data.get("year"):
-            year = int(data["year"])
-            # Year should be between 1950 and current year + 2
-            if year < 1950 or year > datetime.now().year + 2:
-                validation_messages.append(f"❌ Invalid year: {year} (must be 1950-{datetime.now().year + 2})")
-                data["year"] = None
-            else:
-                validation_messages.append(f"✅ Year: {year}")
+        if batch.output_file_id:
+            for line in openai_client.files.content(batch.output_file_id).text.splitlines():
+                item = json_loads(line)
+                body = (item.get("response") or {}).get("body") or {}
+                if body.get("choices"):
+                    answers[int(item["custom_id"])] = json_loads(body["choices"][0]["message"]["content"])
+    except Exception as e:
+        print(f"❌ OpenAI batch job failed: {e}")
+    
+    for i in pending:
+        row = rows[i]
+        if i in answers:
+            results[i] = finish_openai_extraction(answers[i], row["title"], row["price_text"], row["description"])
         else:
-            validation_messages.append("⚠️ Year: None")
-        
-        if data.get("price"):
-            price = int(data["price"])
-            # Price should be reasonable (100k - 100M ISK)
-            if price < 100000 or price > 100000000:
-                validation_messages.append(f"❌ Invalid price: {price:,} ISK (must be 100k-100M)")
-                data["price"] = None
-            else:
-                validation_messages.append(f"✅ Price: {price:,} ISK")
+            results[i] = extract_with_openai(row["title"], row["price_text"], row["description"])
+    return results
+
+
+def validate_extracted(data, title, description):
+    """Null out implausible year/price/mileage from the AI and fill mileage by regex if missing."""
+    # Validate extracted data
+    validation_messages = []
+
+    if data.get("year"):
+        year = int(data["year"])
+        # Year should be between 1950 and current year + 2
+        if year < 1950 or year > datetime.now().year + 2:
+            validation_messages.append(f"❌ Invalid year: {year} (must be 1950-{datetime.now().year + 2})")
+            data["year"] = None
         else:
-            validation_messages.append("⚠️ Price: None")
-        
-        if data.get("mileage"):
-            mileage = int(data["mileage"])
-            # Mileage should be reasonable (0 - 1M km)
-            if mileage < 0 or mileage > 1000000:
-                validation_messages.append(f"❌ Invalid mileage: {mileage:,} km (must be 0-1M)")
-                data["mileage"] = None
-            else:
-                validation_messages.append(f"✅ Mileage: {mileage:,} km")
+            validation_messages.append(f"✅ Year: {year}")
+    else:
+        validation_messages.append("⚠️ Year: None")
+
+    if data.get("price"):
+        price = int(data["price"])
+        # Price should be reasonable (100k - 100M ISK)
+        if price < 100000 or price > 100000000:
+            validation_messages.append(f"❌ Invalid price: {price:,} ISK (must be 100k-100M)")
+            data["price"] = None
+        else:
+            validation_messages.append(f"✅ Price: {price:,} ISK")
+    else:
+        validation_messages.append("⚠️ Price: None")
+
+    if data.get("mileage"):
+        mileage = int(data["mileage"])
+        # Mileage should be reasonable (0 - 1M km)
+        if mileage < 0 or mileage > 1000000:
+            validation_messages.append(f"❌ Invalid mileage: {mileage:,} km (must be 0-1M)")
+            data["mileage"] = None
         else:
-            validation_messages.append("⚠️ Mileage: None")
+            validation_messages.append(f"✅ Mileage: {mileage:,} km")
+    else:
+        validation_messages.append("⚠️ Mileage: None")
+
+    validation_messages.append(f"✅ Make: {data.get('make', 'None')}")
+    validation_messages.append(f"✅ Model: {data.get('model', 'None')}")
+
+    # Log validation results
+    logger.debug("🤖 AI EXTRACTION - VALIDATION for %s\n%s", title, "\n".join(validation_messages))
+    # If AI omitted mileage, try a regex fallback on title+description
+    if not data.get("mileage"):
+        fallback_m = extract_mileage(f"{title}\n{description}")
+        if fallback_m and 0 <= fallback_m <= 1000000:
+            data["mileage"] = fallback_m
+            logger.debug("ℹ️ Filled mileage from regex fallback: %s km", fallback_m)
+
+    return data
+
+
+def listing_prompt_text(title, price_text, description):
+    """Title, price and (truncated) description as the AI sees one listing."""
+    description = (description or "")[:LLM_DESCRIPTION_MAX_CHARS]
+    return f"Title: {title}\nPrice: {price_text}\nDescription:\n{description}"
+
+
+def openai_listing_messages(title, price_text, description):
+    """Chat messages for a single-listing OpenAI extraction."""
+    return [
+        {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
+        {"role": "user", "content": listing_prompt_text(title, price_text, description)}
+    ]
+
+
+def openai_listing_request(title, price_text, description):
+    """chat.completions.create arguments for one listing (also a Batch API request body)."""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": openai_listing_messages(title, price_text, description),
+        "temperature": 0,
+        "max_tokens": LLM_TOKENS_PER_LISTING,
+        "response_format": LISTING_RESPONSE_FORMAT,
+    }
+
+
+def finish_openai_extraction(data, title, price_text, description):
+    """Turn one parsed OpenAI answer into the extraction result and cache it."""
+    # Check if AI classified as non-vehicle
+    if data.get("is_vehicle") == False:
+        logger.debug("🚫 AI CLASSIFIED AS NON-VEHICLE (part/accessory): %s", title)
+        put_cached(cache_key(title, price_text, description), {})
+        return {}
+    
+    data = validate_extracted(data, title, description)
+    put_cached(cache_key(title, price_text, description), data)
+    return data
+
+
+def extract_with_openai(title, price_text, description):
+    """Extract using OpenAI API with structured output."""
+    try:
+        # Log input data
+        logger.debug(
+            "🤖 AI EXTRACTION - INPUT DATA\nTitle: %s\nPrice Text: %s\nDescription (first 200 chars): %.200s...",
+            title, price_text, description,
+        )
+        
+        response = openai_client.chat.completions.create(
+            **openai_listing_request(title, price_text, description),
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
         
-        validation_messages.append(f"✅ Make: {data.get('make', 'None')}")
-        validation_messages.append(f"✅ Model: {data.get('model', 'None')}")
+        logger.debug("🤖 AI prompt tokens: %s", response.usage.prompt_tokens)
+        text = response.choices[0].message.content
+        data = json_loads(text)
         
-        # Log validation results
-        print("🤖 AI EXTRACTION - VALIDATION")
-        print("="*80)
-        for msg in validation_messages:
-            print(msg)
-        print("="*80 + "\n")
-        # If AI omitted mileage, try a regex fallback on title+description
-        if not data.get("mileage"):
-            fallback_m = extract_mileage(f"{title}\n{description}")
-            if fallback_m and 0 <= fallback_m <= 1000000:
-                data["mileage"] = fallback_m
-                print(f"ℹ️ Filled mileage from regex fallback: {fallback_m} km")
-
-        return data
+        # Log raw AI output
+        logger.debug("🤖 AI EXTRACTION - RAW OUTPUT\nRaw JSON: %s", text)
+        
+        return finish_openai_extraction(data, title, price_text, description)
     except Exception as e:
         print(f"❌ OpenAI extraction failed: {e}")
         print("Falling back to regex extraction")
@@ -296,10 +711,16 @@ def extract_with_gemini(title, price_text, description):
     Return only JSON: {{ "make": ..., "model": ..., "year": ..., "price": ..., "mileage": ... }}
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        text = response.text.strip()
-        json_str = text[text.find("{"): text.rfind("}") + 1]
-        data = json.loads(json_str)
+        response = with_retry_sync(
+            lambda: gemini_model.generate_content(
+                prompt,
+                generation_config={"response_mime_type": "application/json"},
+                request_options={"timeout": LLM_TIMEOUT_SECONDS},
+            ),
+            GEMINI_RETRY_ERRORS,
+        )
+        data = json_loads(response.text)
+        put_cached(cache_key(title, price_text, description), data)
         return data
     except Exception as e:
         print(f"Gemini extraction failed: {e}")
@@ -312,7 +733,7 @@ def extract_with_regex(title, price_text, description):
     
     # Try to extract year from title or description
     combined = f"{title} {description}"
-    year_match = re.search(r'\b(19|20)\d{2}\b', combined)
+    year_match = YEAR_RE.search(combined)
     if year_match:
         data["year"] = int(year_match.group(0))
     
@@ -324,26 +745,57 @@ def extract_with_regex(title, price_text, description):
     
     # Try to extract make/model from title (basic splitting)
     if title:
-        # Common Icelandic car makes
-        makes = ["toyota", "volkswagen", "vw", "audi", "bmw", "mercedes", "mercedes-benz", "ford", 
-                "nissan", "hyundai", "kia", "mazda", "honda", "subaru", "volvo", "skoda", "seat",
-                "peugeot", "citroen", "renault", "opel", "chevrolet", "dodge", "jeep", "land rover",
-                "range rover", "tesla", "lexus", "mitsubishi", "suzuki", "fiat"]
-        
-        title_lower = title.lower()
-        for make in makes:
-            if make in title_lower:
-                data["make"] = make
-                # Try to get model (words after make)
-                make_idx = title_lower.find(make)
-                after_make = title[make_idx + len(make):].strip()
-                model_parts = after_make.split()[:3]  # Take first 3 words as model
-                if model_parts:
-                    data["model"] = " ".join(model_parts)
-                break
+        match = TITLE_MAKE_RE.search(title)
+        if match:
+            data["make"] = match.group(0).lower()
+            # Try to get model (words after make)
+            model_parts = title[match.end():].split()
+            if model_parts and model_parts[0].lower() == "benz":
+                model_parts = model_parts[1:]  # "Mercedes Benz E220"
+            model_parts = model_parts[:3]  # Take first 3 words as model
+            if model_parts:
+                data["model"] = " ".join(model_parts)
     
     return data
 
+
+def extract_complete_with_regex(title, price_text, description):
+    """Regex extraction, but only when it recovers every field with plausible values
+    (so the AI call can be skipped). Returns None otherwise."""
+    data = extract_with_regex(title, price_text, description)
+    if not all(data.get(field) for field in ("make", "model", "year", "price", "mileage")):
+        return None
+    
+    # Only store makes that land in a known reference-price bucket
+    make = normalize_make(data["make"])
+    if make not in CANONICAL_TITLE_MAKES:
+        return None
+    data["make"] = make
+    
+    # The regex model is up to three title words after the make - cut it at the year
+    model_words = []
+    for word in data["model"].split():
+        if YEAR_RE.fullmatch(word):
+            break
+        model_words.append(word)
+    if not model_words:
+        return None
+    data["model"] = " ".join(model_words)
+    
+    # Same bounds validate_extracted applies to AI output
+    if not 1950 <= data["year"] <= datetime.now().year + 2:
+        return None
+    if not 100000 <= data["price"] <= 100000000:
+        return None
+    if not 0 < data["mileage"] <= 1000000:
+        return None
+    
+    global llm_skipped
+    with _llm_skipped_lock:
+        llm_skipped += 1
+    data["is_vehicle"] = True
+    return data
+
 def normalize_facebook_url(url):
     """
     Normalize Facebook URL by removing tracking parameters.
@@ -354,7 +806,7 @@ def normalize_facebook_url(url):
         return url
     
     # Extract just the item ID
-    match = re.search(r'/marketplace/item/(\d+)', url)
+    match = ITEM_ID_RE.search(url)
     if match:
         item_id = match.group(1)
         return f"https://www.facebook.com/marketplace/item/{item_id}/"
@@ -364,228 +816,518 @@ def normalize_facebook_url(url):
 
 # ----- Facebook login -----
 async def ensure_facebook_login(context):
-    if not os.path.exists(COOKIES_FILE):
-        print("No Facebook cookies found. Opening login page...")
-        page = await context.new_page()
-        await page.goto("https://www.facebook.com/")
-        print("Please log in manually, then press ENTER here when finished.")
-        input()
-        await context.storage_state(path=COOKIES_FILE)
-        print(f"Saved new Facebook login session to {COOKIES_FILE}")
-        await page.close()
+    """Make sure the persistent profile is logged in. A fresh profile is seeded from
+    COOKIES_FILE when it exists; otherwise log in by hand (the profile keeps it)."""
+    cookies = await context.cookies("https://www.facebook.com")
+    if any(cookie["name"] == "c_user" for cookie in cookies):
+        return
+    if os.path.exists(COOKIES_FILE):
+        with open(COOKIES_FILE, "r") as f:
+            state = json.load(f)
+        await context.add_cookies(state.get("cookies", []))
+        print(f"Imported Facebook login from {COOKIES_FILE} into {FB_PROFILE_DIR}")
+        return
+    print("No Facebook cookies found. Opening login page...")
+    page = await context.new_page()
+    await page.goto("https://www.facebook.com/")
+    print("Please log in manually, then press ENTER here when finished.")
+    input()
+    print(f"Saved new Facebook login session in {FB_PROFILE_DIR}")
+    await page.close()
+
+# ----- Listing pages (plain HTTP) -----
+def parse_listing_json(html):
+    """Pull the raw listing fields out of a listing page's embedded JSON.
+    Returns None when there is no title (login wall or a layout change)."""
+    fields = {}
+    for name, pattern in LISTING_JSON_RES.items():
+        match = pattern.search(html)
+        if match:
+            try:
+                fields[name] = json_loads(f'"{match.group(1)}"')
+            except ValueError:
+                pass
+    return fields if fields.get("title") else None
+
+
+async def fetch_listing_http(http, sem, url):
+    """Fetch one listing without a browser; None means use Playwright for it."""
+    async with sem:
+        try:
+            async with http.get(url) as resp:
+                if resp.status != 200:
+                    return None
+                html = await resp.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    fields = parse_listing_json(html)
+    if fields is None:
+        return None
+    image_url = fields.get("image")
+    return {
+        "url": url,
+        "title": normalize_title(fields["title"]),
+        "price_text": fields.get("price"),
+        "description": clean_text(fields.get("description")),
+        "image_url": image_url if image_url and image_url.startswith("http") else None,
+    }
+
+
+async def fetch_listings_http(urls, cookies, out_q=None, concurrency=FACEBOOK_HTTP_CONCURRENCY):
+    """Fetch listings over plain HTTP with the browser profile's cookies.
+    Each listing that worked is also put on out_q as soon as it arrives.
+    Returns {url: listing} for the ones that worked."""
+    sem = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+
+    async def fetch(http, url):
+        listing = await fetch_listing_http(http, sem, url)
+        if listing is not None and out_q is not None:
+            out_q.put_nowait(listing)
+        return listing
+
+    async with aiohttp.ClientSession(headers=HTTP_HEADERS, cookies=cookies, timeout=timeout) as http:
+        listings = await asyncio.gather(*[fetch(http, url) for url in urls])
+    return {url: listing for url, listing in zip(urls, listings) if listing is not None}
+
+
+# ----- Listing pages (browser) -----
+async def open_listing(page, url):
+    """Navigate to a listing and wait until its title is in the DOM."""
+    await page.goto(url, wait_until="domcontentloaded", timeout=LISTING_NAV_TIMEOUT_MS)
+    await page.wait_for_selector(LISTING_READY_SELECTOR, state="attached", timeout=LISTING_READY_TIMEOUT_MS)
+
+
+async def scrape_one(url, pages):
+    """Read one listing's raw fields in a tab borrowed from the pages queue.
+    AI extraction and DB work are left to the caller."""
+    page = await pages.get()
+    try:
+        await with_retry(lambda: open_listing(page, url), PwTimeout)
+        await asyncio.sleep(random.uniform(0.1, 0.4))  # small jitter between requests
+
+        fields = await page.evaluate(LISTING_FIELDS_JS, LISTING_FIELDS_ARG) or {}
+
+        # The full description is embedded in the page's JSON - no need to expand "See more"
+        raw_description = None
+        if fields.get("descriptionJson"):
+            try:
+                raw_description = json_loads(f'"{fields["descriptionJson"]}"')
+            except ValueError:
+                pass
+
+        # Try expanding "See more" (description), then read the fields again
+        if raw_description is None:
+            try:
+                see_more_btn = page.locator(LISTING_CONTAINER_SELECTOR).locator(SEE_MORE_SELECTOR).first
+                if await see_more_btn.count():
+                    # click() scrolls the button into view itself
+                    await see_more_btn.click()
+                    # The button goes away once the description is expanded
+                    try:
+                        await see_more_btn.wait_for(state="hidden", timeout=2000)
+                    except Exception:
+                        pass
+                    fields = await page.evaluate(LISTING_FIELDS_JS, LISTING_FIELDS_ARG) or fields
+            except Exception as e:
+                print(f"Failed to click 'See more': {e}")
+            raw_description = fields.get("description")
+
+        raw_title = fields.get("title")
+        title = normalize_title(raw_title) if raw_title else None
+        price_text = fields.get("price")
+        description = clean_text(raw_description)
+        image_url = fields.get("image")
+    finally:
+        # Hand the tab to the next listing (a fresh one if this tab crashed)
+        if page.is_closed():
+            page = await page.context.new_page()
+        pages.put_nowait(page)
+
+    return {
+        "url": url,
+        "title": title,
+        "price_text": price_text,
+        "description": description,
+        "image_url": image_url,
+    }
+
+
+def prepare_listing(listing):
+    """Normalize and validate one scraped + extracted listing.
+    Returns the fields to store, or None when the listing should be skipped."""
+    url = listing["url"]
+    title = listing["title"]
+    description = listing["description"]
+    structured = listing["structured"]
+
+    # Normalize make/model after LLM extraction
+    raw_make = structured.get("make")
+    raw_model = structured.get("model")
+    make = normalize_make(raw_make) if raw_make else None
+    model = normalize_model(raw_model) if raw_model else None
+
+    year = structured.get("year")
+    price = extract_number(structured.get("price") or listing["price_text"])
+    mileage = structured.get("mileage")
+    if mileage is None:
+        mileage = extract_mileage(description)
+
+    # Skip non-vehicles (already tracked as rejected in extract_structured_data)
+    if structured == {}:
+        print(f"Skipping non-vehicle listing: {title}")
+        return None
+    if price and price > 100_000_000:
+        print(f"Skipping unrealistic price for {title}: {price}")
+        item_id = extract_item_id(url)
+        if item_id:
+            add_rejected_item(item_id, "invalid_data", f"Unrealistic price: {price}")
+        return None
+
+    return {
+        "url": url,
+        # Survives Facebook's changing tracking parameters
+        "canonical_url": normalize_facebook_url(url),
+        "title": title,
+        "make": make,
+        "model": model,
+        "year": year,
+        "price": price,
+        "mileage": mileage,
+        "description": description,
+        "image_url": listing["image_url"],
+    }
+
+
+def listing_key(car):
+    """(make, model, year, title) fallback match key, or None if any part is missing."""
+    key = (car["make"], car["model"], car["year"], car["title"])
+    return key if all(key) else None
+
+
+# Stored columns save_listing compares against (plain dicts, so matching rows
+# carry no per-object ORM bookkeeping)
+EXISTING_COLUMNS = (
+    CarListing.id, CarListing.canonical_url, CarListing.title, CarListing.make, CarListing.model,
+    CarListing.year, CarListing.price, CarListing.kilometers, CarListing.description,
+    CarListing.display_make, CarListing.display_name, CarListing.image_url,
+)
+
+
+def load_existing_listings(session, cars):
+    """Fetch the stored rows for a run's listings in (at most) two queries.
+    Returns (by_canonical_url, by_key) mapping to row dicts; by_key only covers
+    listings not matched by canonical URL."""
+    by_canonical_url = {}
+    by_key = {}
+
+    canonical_urls = {car["canonical_url"] for car in cars}
+    if canonical_urls:
+        rows = session.execute(
+            select(*EXISTING_COLUMNS)
+            .where(CarListing.source == "Facebook Marketplace", CarListing.canonical_url.in_(canonical_urls))
+            .order_by(CarListing.id)
+        ).mappings()
+        for row in rows:
+            by_canonical_url.setdefault(row["canonical_url"], dict(row))
+
+    keys = {
+        key for car in cars
+        if car["canonical_url"] not in by_canonical_url and (key := listing_key(car))
+    }
+    if keys:
+        rows = session.execute(
+            select(*EXISTING_COLUMNS)
+            .where(
+                CarListing.source == "Facebook Marketplace",
+                tuple_(CarListing.make, CarListing.model, CarListing.year, CarListing.title).in_(keys),
+            )
+            .order_by(CarListing.id)
+        ).mappings()
+        for row in rows:
+            by_key.setdefault((row["make"], row["model"], row["year"], row["title"]), dict(row))
+
+    return by_canonical_url, by_key
+
+
+def load_recently_scraped(session, urls):
+    """Map canonical URL -> id for the listings among urls scraped in the last
+    RECENT_SCRAPE_HOURS (one query)."""
+    canonical_urls = {normalize_facebook_url(url) for url in urls}
+    if not canonical_urls:
+        return {}
+    rows = session.execute(
+        select(CarListing.canonical_url, CarListing.id)
+        .where(
+            CarListing.source == "Facebook Marketplace",
+            CarListing.canonical_url.in_(canonical_urls),
+            CarListing.scraped_at > datetime.utcnow() - timedelta(hours=RECENT_SCRAPE_HOURS),
+        )
+    )
+    return {canonical_url: listing_id for canonical_url, listing_id in rows}
+
+
+def save_listing(car, by_canonical_url, by_key, new_rows, updates):
+    """Match one prepared listing against the maps from load_existing_listings (kept
+    up to date here) and queue the write: an insert mapping on new_rows, or the
+    changed columns on updates[id]. Returns (new, updated) counts."""
+    url = car["url"]
+    title = car["title"]
+    make = car["make"]
+    model = car["model"]
+    year = car["year"]
+    price = car["price"]
+    mileage = car["mileage"]
+    description = car["description"]
+    image_url = car["image_url"]
+    key = listing_key(car)
+
+    # Upsert - match by canonical URL first (most reliable for Facebook),
+    # then by make/model/year/title if we have enough data
+    existing = by_canonical_url.get(car["canonical_url"])
+    if not existing and key:
+        existing = by_key.get(key)
+
+    if existing:
+        changes = {}
+        if existing["canonical_url"] is None:
+            changes["canonical_url"] = car["canonical_url"]
+        updated = False
+        for field, value in {
+            "price": price,
+            "kilometers": mileage,
+            "description": description,
+            # Don't update URL - causes duplicates due to changing tracking params
+        }.items():
+            if value is not None and existing[field] != value:
+                changes[field] = value
+                updated = True
+        
+        # Update structured fields if missing in DB but we have them now
+        for field, value in {
+            "make": make,
+            "model": model,
+            "year": year,
+        }.items():
+            if value is not None and existing[field] is None:
+                changes[field] = value
+                updated = True
+        
+        # Update display fields if we just filled make/model
+        if make and not existing["display_make"]:
+            changes["display_make"] = pretty_make(make)
+            updated = True
+        if model and not existing["display_name"]:
+            changes["display_name"] = get_display_name(model)
+            updated = True
+        
+        # Always update image_url if we have one and DB doesn't (or it's different)
+        if image_url and existing["image_url"] != image_url:
+            changes["image_url"] = image_url
+            updated = True
+        
+        if updated:
+            changes["scraped_at"] = datetime.utcnow()
+        # Rows inserted earlier in this run have no id yet - their pending insert is edited in place
+        existing.update(changes)
+        if changes and existing.get("id") is not None:
+            updates.setdefault(existing["id"], {"id": existing["id"]}).update(changes)
+        return (0, 1) if updated else (0, 0)
+
+    listing = {
+        "source": "Facebook Marketplace",
+        "title": title,
+        "make": make,
+        "model": model,
+        "year": year,
+        "price": price,
+        "kilometers": mileage,
+        "url": url,
+        "canonical_url": car["canonical_url"],
+        "display_make": pretty_make(make) if make else None,
+        "display_name": get_display_name(model) if model else None,
+        "scraped_at": datetime.utcnow(),
+        "description": description,
+        "image_url": image_url,
+    }
+    new_rows.append(listing)
+    by_canonical_url.setdefault(car["canonical_url"], listing)
+    if key:
+        by_key.setdefault(key, listing)
+    return 1, 0
+
+
+def write_listings(session, new_rows, updates):
+    """Flush the queued inserts and updates from save_listing in bulk."""
+    if new_rows:
+        session.bulk_insert_mappings(CarListing, new_rows)
+    if updates:
+        session.bulk_update_mappings(CarListing, list(updates.values()))
+
+
+async def extract_stage(listings_q, extract=extract_structured_data_batch, batch_size=LLM_BATCH_SIZE):
+    """Pipeline stage between scraping and the DB: groups listings from listings_q
+    into batch_size batches (None: one batch at the end) and runs extract on each in
+    a thread (the AI clients are blocking), up to LLM_CONCURRENCY at once, while
+    scraping goes on. Stops at a None sentinel and returns the listings with
+    "structured" set."""
+    sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def run(batch):
+        async with sem:
+            return await asyncio.to_thread(extract, batch)
+
+    batches = []
+    tasks = []
+    batch = []
+    while True:
+        listing = await listings_q.get()
+        if listing is not None:
+            batch.append(listing)
+        if batch and (listing is None or len(batch) == batch_size):
+            batches.append(batch)
+            tasks.append(asyncio.create_task(run(batch)))
+            batch = []
+        if listing is None:
+            break
+
+    extracted = await asyncio.gather(*tasks)
+    scraped = []
+    for batch, structured_list in zip(batches, extracted):
+        for listing, structured in zip(batch, structured_list):
+            listing["structured"] = structured
+            scraped.append(listing)
+    return scraped
+
 
 # ----- Main scraper -----
-async def scrape_facebook(max_items=20, start_urls=None):
+async def scrape_facebook(max_items=20, start_urls=None, concurrency=FACEBOOK_CONCURRENCY, batch_api=False):
     """Scrape Facebook Marketplace listings.
     
     Args:
         max_items: Maximum number of listings to scrape (when scrolling)
         start_urls: Optional list of listing URLs to scrape directly (skips scrolling)
+        concurrency: Listings open at once (tabs in the persistent context)
+        batch_api: Extract through one OpenAI Batch API job after scraping (cheaper,
+            but the run waits for the job) instead of realtime calls
     """
     session = SessionLocal()
     new_listings = 0
     updated_listings = 0
+    seen_urls = []
+    llm_skipped_before = llm_skipped
+    recent = {}
+
+    # Scraped listings flow straight into AI extraction, so AI calls overlap the scraping
+    listings_q = asyncio.Queue()
+    if batch_api and AI_PROVIDER == "openai":
+        extraction = asyncio.create_task(extract_stage(listings_q, extract_structured_data_batch_api, None))
+    else:
+        extraction = asyncio.create_task(extract_stage(listings_q))
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=COOKIES_FILE if os.path.exists(COOKIES_FILE) else None)
-        await ensure_facebook_login(context)
-        page = await context.new_page()
+    async def scrape_and_queue(url, pages):
+        listing = await scrape_one(url, pages)
+        listings_q.put_nowait(listing)
+
+    try:
+        async with browser_pool.persistent_context(FB_PROFILE_DIR) as context:
+            # Only text and image URLs are read - the img src is in the DOM without fetching the bytes
+            await browser_pool.block_heavy_resources(context)
+            await ensure_facebook_login(context)
+            page = await context.new_page()
         
-        # If start_urls provided, use them directly (from seed file)
-        if start_urls:
-            listing_urls = start_urls[:max_items] if max_items else start_urls
-            print(f"Scraping {len(listing_urls)} listings from provided URLs...")
-        else:
-            # Original behavior: scroll and discover
-            await page.goto(FB_URL)
-            await page.wait_for_selector('div[role="main"]')
-
-            print("Scrolling to load more listings...")
-            for _ in range(5):
-                await page.mouse.wheel(0, 5000)
-                await asyncio.sleep(2)
-
-            items = await page.query_selector_all('a[href*="/marketplace/item/"]')
-            listing_urls = []
-            for item in items[:max_items]:
-                url = await item.get_attribute("href")
-                if url and url.startswith("/"):
-                    url = f"https://www.facebook.com{url}"
-                if url:
-                    listing_urls.append(url)
-
-            print(f"Found {len(listing_urls)} listings. Visiting each one...")
-
-        for url in listing_urls:
-            await page.goto(url)
-            await page.wait_for_selector('xpath=/html/body/div[1]/div/div[1]/div/div[3]/div/div/div[1]/div[1]/div[2]/div/div/div/div/div/div[1]')
-            await asyncio.sleep(random.uniform(2, 5))  # human-like delay
-
-            container = await page.query_selector('xpath=/html/body/div[1]/div/div[1]/div/div[3]/div/div/div[1]/div[1]/div[2]/div/div/div/div/div/div[1]')
-
-            # Try expanding "See more" (description)
-            try:
-                see_more_xpath = '/html/body/div[1]/div/div[1]/div/div[3]/div/div/div[1]/div[1]/div[2]/div/div/div/div/div/div[1]/div[2]/div/div[2]/div/div[1]/div[1]/div[5]/div[2]/div/div[1]/div/span/div/span'
-                see_more_btn = await page.query_selector(f'xpath={see_more_xpath}')
-                if see_more_btn:
-                    await see_more_btn.scroll_into_view_if_needed()
-                    await asyncio.sleep(0.3)
-                    await see_more_btn.click()
-                    await asyncio.sleep(1)
-            except Exception as e:
-                print(f"Failed to click 'See more': {e}")
+            # If start_urls provided, use them directly (from seed file)
+            if start_urls:
+                listing_urls = start_urls[:max_items] if max_items else start_urls
+                print(f"Scraping {len(listing_urls)} listings from provided URLs...")
+            else:
+                # Original behavior: scroll and discover
+                await page.goto(FB_URL)
+                await page.wait_for_selector('div[role="main"]')
 
-            # Collect scoped text
-            title_el = await container.query_selector('h1 span[dir="auto"]')
-            raw_title = await title_el.inner_text() if title_el else None
-            title = normalize_title(raw_title) if raw_title else None
-
-            price_el = await container.query_selector('span:has-text("ISK"), span:has-text("kr")')
-            price_text = await price_el.inner_text() if price_el else None
-
-            # Try primary description xpath, then fallbacks
-            desc_el = await page.query_selector('xpath=/html/body/div[1]/div/div[1]/div/div[3]/div/div/div[1]/div[1]/div[2]/div/div/div/div/div/div[1]/div[2]/div/div[2]/div/div[1]/div[1]/div[5]/div[2]/div')
-            if not desc_el:
-                # Fallback: try class-based selector
-                desc_el = await page.query_selector('div.xz9dl7a.xn6708d.xsag5q8.x1ye3gou')
-            if not desc_el:
-                # Fallback: use container (includes all listing content)
-                desc_el = container
-            raw_description = await desc_el.inner_text() if desc_el else None
-            description = clean_text(raw_description)
-
-            # Image URL - Facebook typically has images in img tags with specific attributes
-            image_url = None
-            try:
-                # Try to find the main listing image (usually in a gallery or as the primary photo)
-                img_el = await page.query_selector('img[data-visualcompletion="media-vc-image"]')
-                if not img_el:
-                    # Fallback to any large image in the container
-                    img_el = await container.query_selector('img[src*="scontent"]')
-                if img_el:
-                    img_src = await img_el.get_attribute("src")
-                    if img_src and img_src.startswith("http"):
-                        image_url = img_src
-            except Exception as e:
-                print(f"Failed to extract image URL: {e}")
-
-            # Extract with AI/regex
-            structured = extract_structured_data(title, price_text, description, url)
-
-            # Normalize make/model after LLM extraction
-            raw_make = structured.get("make")
-            raw_model = structured.get("model")
-            make = normalize_make(raw_make) if raw_make else None
-            model = normalize_model(raw_model) if raw_model else None
-
-            year = structured.get("year")
-            price = extract_number(structured.get("price") or price_text)
-            mileage = structured.get("mileage")
-            if mileage is None:
-                mileage = extract_mileage(description)
-
-            # Skip non-vehicles (already tracked as rejected in extract_structured_data)
-            if structured == {}:
-                print(f"Skipping non-vehicle listing: {title}")
-                continue
-            if price and price > 100_000_000:
-                print(f"Skipping unrealistic price for {title}: {price}")
-                item_id = extract_item_id(url)
-                if item_id:
-                    add_rejected_item(item_id, "invalid_data", f"Unrealistic price: {price}")
-                continue
-
-            # Update last_seen_at timestamp (this listing is still active on Facebook)
-            update_last_seen(url)
-
-            # Normalize URL to handle Facebook's changing tracking parameters
-            normalized_url = normalize_facebook_url(url)
-
-            # Upsert - check by normalized URL first (most reliable for Facebook)
-            existing = (
-                session.query(CarListing)
-                .filter_by(source="Facebook Marketplace")
-                .filter(CarListing.url.like(f"%/marketplace/item/{normalized_url.split('/')[-2]}/%"))
-                .first()
+                print("Scrolling to load more listings...")
+                # Scroll until enough listing links exist or the feed stops growing
+                for _ in range(DISCOVERY_MAX_SCROLLS):
+                    height, count = await page.evaluate(DISCOVERY_STATE_JS)
+                    if max_items and count >= max_items:
+                        break
+                    await page.mouse.wheel(0, 5000)
+                    try:
+                        await page.wait_for_function(
+                            "h => document.body.scrollHeight > h", arg=height, timeout=DISCOVERY_GROWTH_TIMEOUT_MS
+                        )
+                    except PwTimeout:
+                        break
+
+                items = await page.query_selector_all('a[href*="/marketplace/item/"]')
+                listing_urls = []
+                for item in items[:max_items]:
+                    url = await item.get_attribute("href")
+                    if url and url.startswith("/"):
+                        url = f"https://www.facebook.com{url}"
+                    if url:
+                        listing_urls.append(url)
+
+                print(f"Found {len(listing_urls)} listings. Visiting each one...")
+
+            # Listings scraped a few hours ago are only marked as seen, not visited
+            recent = load_recently_scraped(session, listing_urls)
+            if recent:
+                listing_urls = [url for url in listing_urls if normalize_facebook_url(url) not in recent]
+                print(f"Skipping {len(recent)} listings scraped in the last {RECENT_SCRAPE_HOURS} h")
+
+            # Most listings come straight from their HTML; only the rest need a tab
+            cookies = {cookie["name"]: cookie["value"] for cookie in await context.cookies("https://www.facebook.com")}
+            scraped_http = await fetch_listings_http(listing_urls, cookies, listings_q)
+            browser_urls = [url for url in listing_urls if url not in scraped_http]
+            print(f"Fetched {len(scraped_http)} listings over HTTP, {len(browser_urls)} need the browser")
+
+            # A fixed set of tabs in the one context, starting with the discovery tab
+            n = max(1, min(concurrency, len(browser_urls)))
+            pages = asyncio.Queue()
+            pages.put_nowait(page)
+            for _ in range(n - 1):
+                pages.put_nowait(await context.new_page())
+            results = await asyncio.gather(
+                *[scrape_and_queue(url, pages) for url in browser_urls],
+                return_exceptions=True,
             )
-            
-            # If not found by URL and we have enough data, try by make/model/year/title
-            if not existing and all([make, model, year, title]):
-                existing = (
-                    session.query(CarListing)
-                    .filter_by(
-                        source="Facebook Marketplace",
-                        make=make,
-                        model=model,
-                        year=year,
-                        title=title,
-                    )
-                    .first()
-                )
-
-            if existing:
-                updated = False
-                for field, value in {
-                    "price": price,
-                    "kilometers": mileage,
-                    "description": description,
-                    # Don't update URL - causes duplicates due to changing tracking params
-                }.items():
-                    if value is not None and getattr(existing, field) != value:
-                        setattr(existing, field, value)
-                        updated = True
-                
-                # Update structured fields if missing in DB but we have them now
-                for field, value in {
-                    "make": make,
-                    "model": model,
-                    "year": year,
-                }.items():
-                    if value is not None and getattr(existing, field) is None:
-                        setattr(existing, field, value)
-                        updated = True
-                
-                # Update display fields if we just filled make/model
-                if make and not existing.display_make:
-                    existing.display_make = pretty_make(make)
-                    updated = True
-                if model and not existing.display_name:
-                    existing.display_name = get_display_name(model)
-                    updated = True
-                
-                # Always update image_url if we have one and DB doesn't (or it's different)
-                if image_url and existing.image_url != image_url:
-                    existing.image_url = image_url
-                    updated = True
-                
-                if updated:
-                    existing.scraped_at = datetime.utcnow()
-                    updated_listings += 1
-            else:
-                car = CarListing(
-                    source="Facebook Marketplace",
-                    title=title,
-                    make=make,
-                    model=model,
-                    year=year,
-                    price=price,
-                    kilometers=mileage,
-                    url=url,
-                    display_make=pretty_make(make) if make else None,
-                    display_name=get_display_name(model) if model else None,
-                    scraped_at=datetime.utcnow(),
-                    description=description,
-                    image_url=image_url,
-                )
-                session.add(car)
-                new_listings += 1
-
-
-        session.commit()
-        await browser.close()
+            for url, result in zip(browser_urls, results):
+                if isinstance(result, Exception):
+                    print(f"Error scraping {url}: {result}")
+    except BaseException:
+        extraction.cancel()
+        raise
+
+    # Let the extraction stage flush its last batch and wait for the AI calls in flight
+    listings_q.put_nowait(None)
+    scraped = await extraction
+    print(f"Regex had every field for {llm_skipped - llm_skipped_before} listings, no AI call needed")
+
+    # DB work stays on this task: one lookup for the whole run, then one bulk write
+    cars = [car for car in map(prepare_listing, scraped) if car is not None]
+    by_canonical_url, by_key = load_existing_listings(session, cars)
+    new_rows = []
+    updates = {}
+    for car in cars:
+        added, updated = save_listing(car, by_canonical_url, by_key, new_rows, updates)
+        # This listing is still active on Facebook - last_seen_at is bumped in one go below
+        seen_urls.append(car["url"])
+        new_listings += added
+        updated_listings += updated
+
+    # Before committing, so (as before) only listings already in the DB get stamped
+    update_last_seen_bulk(seen_urls)
+    if recent:
+        session.execute(
+            update(CarListing).where(CarListing.id.in_(recent.values())).values(last_seen_at=datetime.utcnow())
+        )
+    write_listings(session, new_rows, updates)
+    session.commit()
     session.close()
     print(f"Done. {new_listings} new listings added. {updated_listings} listings updated.")
 
 if __name__ == "__main__":
-    asyncio.run(scrape_facebook(max_items=10))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    browser_pool.run(scrape_facebook(max_items=10))
@@ -14,13 +14,20 @@ from scrapers.facebook_item_tracker import (
     extract_item_id, 
     get_scraped_item_ids, 
     get_rejected_item_ids,
-    update_last_seen,
+    update_last_seen_bulk,
     mark_old_listings_inactive
 )
 
 FB_URL = "https://www.facebook.com/marketplace/category/vehicles"
 COOKIES_FILE = "fb_state.json"
 SEED_LINKS_FILE = "facebook_seed_links.txt"
+# Last line of a seed file whose discovery run finished
+SEED_LINKS_DONE_MARKER = "# Completed:"
+
+# Every listing link's raw href, collected in the page
+LISTING_HREFS_JS = """
+() => Array.from(document.querySelectorAll('a[href*="/marketplace/item/"]'), a => a.getAttribute('href'))
+"""
 
 # Popular car makes in Iceland for targeted searches
 POPULAR_MAKES = [
@@ -36,21 +43,83 @@ ICELAND_LOCATIONS = [
 ]
 
 
+def load_seed_links():
+    """Listing URLs in the seed file, in discovery order."""
+    if not os.path.exists(SEED_LINKS_FILE):
+        return []
+    with open(SEED_LINKS_FILE, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.startswith("http")]
+
+
+def seed_links_interrupted() -> bool:
+    """True when the seed file was left behind by a discovery run that never finished."""
+    if not os.path.exists(SEED_LINKS_FILE):
+        return False
+    last_line = ""
+    with open(SEED_LINKS_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last_line = line
+    return not last_line.startswith(SEED_LINKS_DONE_MARKER)
+
+
+def start_seed_links(known_ids, found_ids) -> int:
+    """Rewrite the seed file with a fresh header. If the previous run was interrupted,
+    its URLs that are still not scraped or rejected are kept (copied line by line)
+    and their item IDs added to found_ids; a finished run's file is not carried over,
+    so sold or removed listings drop out. Returns how many URLs were kept."""
+    kept = 0
+    carry_over = seed_links_interrupted()
+    tmp_file = f"{SEED_LINKS_FILE}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as out:
+        out.write(f"# Facebook Marketplace seed links\n")
+        out.write(f"# Generated: {datetime.now().isoformat()}\n")
+        out.write(f"# (Excludes {len(known_ids):,} already scraped/rejected)\n")
+        out.write("#\n")
+        if carry_over:
+            with open(SEED_LINKS_FILE, "r", encoding="utf-8") as f:
+                for line in f:
+                    url = line.strip()
+                    item_id = extract_item_id(url) if url.startswith("http") else None
+                    if item_id and item_id not in known_ids and item_id not in found_ids:
+                        found_ids.add(item_id)
+                        out.write(f"{url}\n")
+                        kept += 1
+    os.replace(tmp_file, SEED_LINKS_FILE)
+    return kept
+
+
+def append_seed_links(urls):
+    """Append newly discovered URLs, so a crash keeps everything found so far."""
+    with open(SEED_LINKS_FILE, "a", encoding="utf-8") as f:
+        for url in urls:
+            f.write(f"{url}\n")
+
+
+def finish_seed_links():
+    """Mark the seed file complete, so the next run starts from scratch."""
+    with open(SEED_LINKS_FILE, "a", encoding="utf-8") as f:
+        f.write(f"{SEED_LINKS_DONE_MARKER} {datetime.now().isoformat()}\n")
+
+
 async def discover_facebook_links(max_scrolls=100):
     """Scroll Facebook Marketplace and collect all listing URLs.
     Uses targeted searches for Iceland and popular car makes.
     Only adds NEW URLs that haven't been scraped or rejected before.
+    New URLs are appended to the seed file after every scroll (unscraped URLs
+    left there by an interrupted run are kept); only item IDs are held in memory.
+    Read the URLs back with load_seed_links().
     
     Args:
         max_scrolls: Maximum number of scroll iterations per search
         
     Returns:
-        List of NEW listing URLs (not yet scraped or rejected)
+        Number of NEW listing URLs (not yet scraped or rejected) in the seed file
     """
     
     if not os.path.exists(COOKIES_FILE):
         print(f"Error: {COOKIES_FILE} not found. Please run save_fb_cookies.py first.")
-        return []
+        return 0
     
     # Load already scraped and rejected item IDs from database
     print("Loading existing item IDs from database...")
@@ -61,6 +130,14 @@ async def discover_facebook_links(max_scrolls=100):
     print(f"  - {len(scraped_ids):,} already scraped")
     print(f"  - {len(rejected_ids):,} rejected (non-cars/errors)")
     print(f"  - {len(known_ids):,} total to skip")
+    
+    # Every item ID handled this run (carried over, known or new) - the only per-listing state
+    found_ids = set()
+    
+    # Resume an interrupted run's seed links that still haven't been scraped, then stream new ones after them
+    kept = start_seed_links(known_ids, found_ids)
+    if kept:
+        print(f"  - {kept:,} unscraped URLs kept from the interrupted run in {SEED_LINKS_FILE}")
     print()
     
     with open(COOKIES_FILE, "r") as f:
@@ -71,11 +148,8 @@ async def discover_facebook_links(max_scrolls=100):
         context = await browser.new_context(storage_state=state)
         page = await context.new_page()
         
-        # Set to track unique URLs
-        listing_urls = set()
-        new_urls = set()  # Track truly new URLs
+        new_count = kept
         skipped_known = 0
-        updated_seen = 0
         
         # Search strategies
         # Category parameter: categoryID=vehicles (807311116126722)
@@ -146,50 +220,51 @@ async def discover_facebook_links(max_scrolls=100):
                 while scroll_count < max_scrolls:
                     scroll_count += 1
                     
-                # Get all listing links on the page
-                links = await page.query_selector_all('a[href*="/marketplace/item/"]')
-                
-                before_count = len(listing_urls)
-                for link in links:
-                    href = await link.get_attribute("href")
-                    if href and "/marketplace/item/" in href:
+                    # Get all listing links on the page (one round trip for every href)
+                    hrefs = await page.evaluate(LISTING_HREFS_JS)
+                    
+                    before_count = len(found_ids)
+                    scroll_new_urls = []
+                    for href in hrefs:
+                        if not href:
+                            continue
+                        
                         # Clean URL - remove query params and hash
-                        clean_url = href.split("?")[0].split("#")[0]
+                        clean_url = href.partition("?")[0].partition("#")[0]
                         # Ensure full URL
                         if not clean_url.startswith("http"):
                             clean_url = f"https://www.facebook.com{clean_url}"
                         
-                        # Extract item ID and check if we should skip it
+                        # Links from earlier scrolls are still on the page - handle each item once
                         item_id = extract_item_id(clean_url)
-                        if item_id:
-                            if item_id in known_ids:
-                                skipped_known += 1
-                                
-                                # Update last_seen_at for already-scraped items
-                                if item_id in scraped_ids:
-                                    update_last_seen(clean_url)
-                                    updated_seen += 1
-                                
-                                continue  # Skip this URL - already processed
-                            else:
-                                # This is a NEW item!
-                                new_urls.add(clean_url)
+                        if not item_id or item_id in found_ids:
+                            continue
+                        found_ids.add(item_id)
                         
-                        listing_urls.add(clean_url)
-                
-                new_items = len(listing_urls) - before_count
-                print(f"  Scroll {scroll_count}/{max_scrolls}: Found {new_items} new listings (total: {len(listing_urls)}, {len(new_urls)} truly new)")
-                
-                # Check if we're getting new items
-                if new_items == 0:
-                    no_new_items_count += 1
-                    if no_new_items_count >= 3:
-                        print("  No new listings found after 3 scrolls. Moving to next search.")
-                        break
-                else:
-                    no_new_items_count = 0
-                
-                # Scroll to bottom
+                        if item_id in known_ids:
+                            skipped_known += 1
+                            continue  # Skip this URL - already processed
+                        
+                        # This is a NEW item!
+                        new_count += 1
+                        scroll_new_urls.append(clean_url)
+                    
+                    if scroll_new_urls:
+                        append_seed_links(scroll_new_urls)
+                    
+                    new_items = len(found_ids) - before_count
+                    print(f"  Scroll {scroll_count}/{max_scrolls}: Found {new_items} new listings (total: {len(found_ids) - kept}, {new_count} truly new)")
+                    
+                    # Check if we're getting new items
+                    if new_items == 0:
+                        no_new_items_count += 1
+                        if no_new_items_count >= 3:
+                            print("  No new listings found after 3 scrolls. Moving to next search.")
+                            break
+                    else:
+                        no_new_items_count = 0
+                    
+                    # Scroll to bottom
                     await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
                     await asyncio.sleep(2)
                     
@@ -199,36 +274,31 @@ async def discover_facebook_links(max_scrolls=100):
         
         await browser.close()
     
+    # Every search ran; the next discovery starts a fresh seed file
+    finish_seed_links()
+    
+    # Update last_seen_at for already-scraped items still on Facebook (one UPDATE) before the inactive sweep
+    updated_seen = update_last_seen_bulk(
+        f"https://www.facebook.com/marketplace/item/{item_id}/" for item_id in found_ids & scraped_ids
+    )
+    
     # Mark old listings as inactive (not seen in 7+ days)
     print("\nChecking for old listings to mark inactive...")
     mark_old_listings_inactive(days_threshold=7)
     
-    # Convert new URLs to sorted list (only truly new ones go in seed file!)
-    new_urls_list = sorted(list(new_urls))
-    
     # Print summary
     print(f"\n{'='*60}")
     print(f"Discovery Summary:")
-    print(f"  - {len(listing_urls):,} total URLs found on Facebook")
+    print(f"  - {len(found_ids) - kept:,} total URLs found on Facebook")
     print(f"  - {skipped_known:,} skipped (already scraped/rejected)")
     print(f"  - {updated_seen:,} existing listings updated last_seen_at")
-    print(f"  - {len(new_urls_list):,} NEW URLs to add to seed file")
+    print(f"  - {new_count:,} NEW URLs in seed file")
     print(f"{'='*60}\n")
     
-    # Save ONLY new URLs to file with timestamp
-    with open(SEED_LINKS_FILE, "w", encoding="utf-8") as f:
-        f.write(f"# Facebook Marketplace seed links\n")
-        f.write(f"# Generated: {datetime.now().isoformat()}\n")
-        f.write(f"# Total NEW URLs: {len(new_urls_list)}\n")
-        f.write(f"# (Excludes {len(known_ids):,} already scraped/rejected)\n")
-        f.write("#\n")
-        for url in new_urls_list:
-            f.write(f"{url}\n")
-    
-    print(f"Discovered {len(new_urls_list):,} NEW listing URLs (out of {len(listing_urls):,} total)")
+    print(f"Discovered {new_count:,} NEW listing URLs (out of {len(found_ids) - kept:,} total)")
     print(f"Saved to {SEED_LINKS_FILE}")
     
-    return new_urls_list
+    return new_count
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ Usage examples:
 """
 import os
 import sys
-import asyncio
+import logging
 import typer
 
 # Ensure project root (parent of this scripts directory) is on sys.path when executed directly
@@ -20,9 +20,15 @@ try:
 except Exception:
     pass
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+)
+
 # Import application functions
+from scrapers.common import browser_pool
 from scrapers.facebook_scraper import scrape_facebook  # async
-from scrapers.facebook_seed_links import discover_facebook_links  # async
+from scrapers.facebook_seed_links import discover_facebook_links, load_seed_links  # discover is async
 from scrapers.dealerships.bilaland_scraper import scrape_bilaland  # async
 from scrapers.dealerships.bilasolur_scraper import scrape_bilasolur  # async
 from scrapers.dealerships.islandsbilar_scraper import scrape_islandsbilar  # async
@@ -46,9 +52,12 @@ from delete_incomplete_listings import delete_incomplete_listings
 app = typer.Typer(help="Car scraper automation CLI")
 
 @app.command("scrape-fb")
-def cmd_scrape_fb(max_items: int = typer.Option(10, help="Max listings to visit")):
+def cmd_scrape_fb(
+    max_items: int = typer.Option(10, help="Max listings to visit"),
+    batch_api: bool = typer.Option(False, help="Extract via the OpenAI Batch API (cheaper, slower)")
+):
     """Scrape Facebook Marketplace (requires valid fb_state.json)."""
-    asyncio.run(scrape_facebook(max_items=max_items))
+    browser_pool.run(scrape_facebook(max_items=max_items, batch_api=batch_api))
 
 @app.command("scrape-fb-discover")
 def cmd_scrape_fb_discover(
@@ -56,90 +65,91 @@ def cmd_scrape_fb_discover(
     max_items: int = typer.Option(None, help="Max listings to scrape (optional)")
 ):
     """Discover Facebook Marketplace listing URLs, then scrape them."""
-    urls = asyncio.run(discover_facebook_links(max_scrolls=max_scrolls))
+    browser_pool.run(discover_facebook_links(max_scrolls=max_scrolls))
+    urls = load_seed_links()
     typer.echo(f"Discovered {len(urls)} seed URLs")
     
     if urls:
         items_to_scrape = max_items if max_items else len(urls)
         typer.echo(f"Scraping {min(items_to_scrape, len(urls))} listings...")
-        asyncio.run(scrape_facebook(max_items=items_to_scrape, start_urls=urls))
+        browser_pool.run(scrape_facebook(max_items=items_to_scrape, start_urls=urls))
 
 @app.command("scrape-bilaland")
 def cmd_scrape_bilaland(max_scrolls: int = typer.Option(5, help="Number of scroll iterations")):
     """Scrape Bilaland listings."""
-    asyncio.run(scrape_bilaland(max_scrolls=max_scrolls))
+    browser_pool.run(scrape_bilaland(max_scrolls=max_scrolls))
 
 @app.command("scrape-bilaland-discover")
 def cmd_scrape_bilaland_discover(max_scrolls: int = typer.Option(10, help="Scroll iterations per discovered URL")):
     """Discover Bilaland listing URLs by make, then scrape each one."""
-    urls = asyncio.run(discover_bilaland_links())
+    urls = browser_pool.run(discover_bilaland_links())
     typer.echo(f"Discovered {len(urls)} seed URLs")
     
     for idx, url in enumerate(urls, 1):
         typer.echo(f"[{idx}/{len(urls)}] Scraping {url}")
-        asyncio.run(scrape_bilaland(max_scrolls=max_scrolls, start_url=url))
+        browser_pool.run(scrape_bilaland(max_scrolls=max_scrolls, start_url=url))
 
 @app.command("scrape-bilasolur")
 def cmd_scrape_bilasolur(max_pages: int = typer.Option(100, help="Max pages to traverse")):
     """Scrape Bilasölur listings."""
-    asyncio.run(scrape_bilasolur(max_pages=max_pages))
+    browser_pool.run(scrape_bilasolur(max_pages=max_pages))
 
 @app.command("scrape-bilasolur-discover")
 def cmd_scrape_bilasolur_discover(max_pages: int = typer.Option(500, help="Max pages after discovery")):
     """Discover Bilasölur listing URLs, then scrape them."""
-    urls = asyncio.run(discover_bilasolur_links())
+    urls = browser_pool.run(discover_bilasolur_links())
     typer.echo(f"Discovered {len(urls)} seed URLs")
-    asyncio.run(scrape_bilasolur(start_urls=urls, max_pages=max_pages))
+    browser_pool.run(scrape_bilasolur(start_urls=urls, max_pages=max_pages))
 
 @app.command("scrape-islandsbilar")
 def cmd_scrape_islandsbilar(max_pages: int = typer.Option(20, help="Max pages to scrape")):
     """Scrape Íslandsbílar listings."""
-    asyncio.run(scrape_islandsbilar(max_pages=max_pages))
+    browser_pool.run(scrape_islandsbilar(max_pages=max_pages))
 
 @app.command("scrape-hekla")
 def cmd_scrape_hekla(max_pages: int = typer.Option(20, help="Max pages to scrape")):
     """Scrape Hekla used car listings."""
-    asyncio.run(scrape_hekla(max_pages=max_pages))
+    browser_pool.run(scrape_hekla(max_pages=max_pages))
 
 @app.command("scrape-hekla-discover")
 def cmd_scrape_hekla_discover(max_pages: int = typer.Option(100, help="Max pages per discovered URL")):
     """Discover Hekla listing URLs by make, then scrape each one."""
-    urls = asyncio.run(discover_hekla_links())
+    urls = browser_pool.run(discover_hekla_links())
     typer.echo(f"Discovered {len(urls)} seed URLs")
     
     for idx, url in enumerate(urls, 1):
         typer.echo(f"[{idx}/{len(urls)}] Scraping {url}")
-        asyncio.run(scrape_hekla(max_pages=max_pages, start_url=url))
+        browser_pool.run(scrape_hekla(max_pages=max_pages, start_url=url))
 
 @app.command("scrape-brimborg")
 def cmd_scrape_brimborg(max_pages: int = typer.Option(20, help="Max pages to scrape")):
     """Scrape Brimborg used car listings."""
-    asyncio.run(scrape_brimborg(max_pages=max_pages))
+    browser_pool.run(scrape_brimborg(max_pages=max_pages))
 
 @app.command("scrape-brimborg-discover")
 def cmd_scrape_brimborg_discover(max_pages: int = typer.Option(100, help="Max pages per discovered URL")):
     """Discover Brimborg listing URLs by make, then scrape each one."""
-    urls = asyncio.run(discover_brimborg_links())
+    urls = browser_pool.run(discover_brimborg_links())
     typer.echo(f"Discovered {len(urls)} seed URLs")
     
     for idx, url in enumerate(urls, 1):
         typer.echo(f"[{idx}/{len(urls)}] Scraping {url}")
-        asyncio.run(scrape_brimborg(max_pages=max_pages, start_url=url))
+        browser_pool.run(scrape_brimborg(max_pages=max_pages, start_url=url))
 
 @app.command("scrape-br")
 def cmd_scrape_br(max_scrolls: int = typer.Option(20, help="Max scrolls to load listings")):
     """Scrape BR (br.is) used car listings."""
-    asyncio.run(scrape_br(max_scrolls=max_scrolls))
+    browser_pool.run(scrape_br(max_scrolls=max_scrolls))
 
 @app.command("scrape-br-discover")
 def cmd_scrape_br_discover(max_scrolls: int = typer.Option(20, help="Max scrolls per discovered URL")):
     """Discover BR listing URLs by make, then scrape each one."""
-    urls = asyncio.run(discover_br_links())
+    urls = browser_pool.run(discover_br_links())
     typer.echo(f"Discovered {len(urls)} seed URLs")
     
     for idx, url in enumerate(urls, 1):
         typer.echo(f"[{idx}/{len(urls)}] Scraping {url}")
-        asyncio.run(scrape_br(max_scrolls=max_scrolls, start_url=url))
+        browser_pool.run(scrape_br(max_scrolls=max_scrolls, start_url=url))
 
 @app.command("clean-data")
 def cmd_clean_data():
@@ -149,12 +159,12 @@ def cmd_clean_data():
 @app.command("check-oldest")
 def cmd_check_oldest(limit_per_source: int = typer.Option(100, help="Listings to check per source")):
     """Check oldest active listings to mark inactive ones."""
-    asyncio.run(check_oldest_listings(limit_per_source=limit_per_source))
+    browser_pool.run(check_oldest_listings(limit_per_source=limit_per_source))
 
 @app.command("delete-incomplete")
 def cmd_delete_incomplete(batch_size: int = typer.Option(100, help="Batch size for commits")):
     """Delete incomplete inactive listings."""
-    asyncio.run(delete_incomplete_listings(batch_size=batch_size))
+    browser_pool.run(delete_incomplete_listings(batch_size=batch_size))
 
 @app.command("rebuild-deals")
 def cmd_rebuild_daily_deals():
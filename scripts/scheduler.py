@@ -46,7 +46,7 @@ logging.basicConfig(
 log = logging.getLogger("scheduler")
 
 from scrapers.facebook_scraper import scrape_facebook
-from scrapers.facebook_seed_links import discover_facebook_links
+from scrapers.facebook_seed_links import discover_facebook_links, load_seed_links
 from scrapers.facebook_url_selector import select_balanced_urls, get_scraped_urls_from_db
 from scrapers.dealerships.bilaland_scraper import scrape_bilaland
 from scrapers.dealerships.bilaland_seed_links import discover_bilaland_links
@@ -59,6 +59,7 @@ from scrapers.dealerships.brimborg_scraper import scrape_brimborg
 from scrapers.dealerships.brimborg_seed_links import discover_brimborg_links
 from scrapers.dealerships.br_scraper import scrape_br
 from scrapers.dealerships.br_seed_links import discover_br_links
+from scrapers.common import browser_pool
 from db.reference_price_updater import update_reference_prices
 from deal_checker import check_for_deals
 
@@ -168,7 +169,8 @@ async def job_sequential_scraping():
     global facebook_seed_urls
     try:
         log.info("[7/7] Starting Facebook URL discovery")
-        facebook_seed_urls = await discover_facebook_links(max_scrolls=50)
+        await discover_facebook_links(max_scrolls=50)
+        facebook_seed_urls = load_seed_links()
         log.info(f"✓ Facebook discovery complete: {len(facebook_seed_urls)} URLs")
     except Exception as e:
         log.error(f"✗ Facebook discovery failed: {e}", exc_info=True)
@@ -185,10 +187,10 @@ async def job_facebook_url_discovery():
     global facebook_seed_urls
     try:
         log.info("Starting Facebook URL discovery")
-        new_urls = await discover_facebook_links(max_scrolls=100)
-        # Merge with existing URLs (avoid duplicates)
-        facebook_seed_urls = list(set(facebook_seed_urls + new_urls))
-        log.info(f"✓ Facebook discovery complete: {len(new_urls)} new URLs, {len(facebook_seed_urls)} total")
+        new_count = await discover_facebook_links(max_scrolls=100)
+        # Discovery re-finds every unscraped listing still on Facebook, so the seed file is the full list
+        facebook_seed_urls = load_seed_links()
+        log.info(f"✓ Facebook discovery complete: {new_count} new URLs, {len(facebook_seed_urls)} total")
     except Exception as e:
         log.error(f"✗ Facebook discovery failed: {e}", exc_info=True)
 
@@ -300,6 +302,8 @@ def main():
         except (KeyboardInterrupt, SystemExit):
             log.info("Scheduler shutting down...")
             sched.shutdown(wait=False)
+        finally:
+            await browser_pool.close_browser()
 
     asyncio.run(runner())
 
@@ -6,7 +6,7 @@ Tests the improved AI extraction with 10 listings.
 
 import asyncio
 from scrapers.facebook_scraper import scrape_facebook
-from scrapers.facebook_seed_links import discover_facebook_links
+from scrapers.facebook_seed_links import discover_facebook_links, load_seed_links
 
 async def test_facebook_scraper():
     """Test Facebook scraper with 10 listings."""
@@ -24,7 +24,8 @@ async def test_facebook_scraper():
     
     # Option 1: Discover fresh URLs (requires Facebook login)
     print("📡 Discovering Facebook listing URLs...")
-    seed_urls = await discover_facebook_links(max_scrolls=20)
+    await discover_facebook_links(max_scrolls=20)
+    seed_urls = load_seed_links()
     
     if not seed_urls:
         print("❌ No URLs discovered. Make sure fb_state.json exists.")
@@ -1,5 +1,6 @@
 # utils/normalizer.py
 import re
+from functools import lru_cache
 import unicodedata
 
 # Maps normalized names back to proper display format
@@ -32,6 +33,8 @@ ALIASES = {
     "volks wagen": "volkswagen",
     "merc": "mercedes-benz",
     "merc benz": "mercedes-benz",
+    "mercedes": "mercedes-benz",
+    "mercedes benz": "mercedes-benz",
     "mb": "mercedes-benz",
     "bmw": "bmw",
     "toy": "toyota",
@@ -127,6 +130,11 @@ MAKE_UPPER = {
     "kia",
 }
 
+# The set of distinct makes/models is small, so the pure string transforms
+# below are memoized to avoid re-normalizing the same values per listing.
+NORMALIZE_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def pretty_make(make: str | None) -> str | None:
     """Return a frontend-friendly display make (for display_make column)."""
     if not make:
@@ -154,6 +162,7 @@ def _strip_weird_spaces(s: str) -> str:
 def _nfkc_lower(s: str) -> str:
     return unicodedata.normalize("NFKC", s).lower()
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_make(make: str | None) -> str | None:
     if not make:
         return None
@@ -162,6 +171,7 @@ def normalize_make(make: str | None) -> str | None:
     m = ALIASES.get(m, m)
     return m or None
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_model(model: str | None) -> str | None:
     if not model:
         return None
@@ -170,6 +180,7 @@ def normalize_model(model: str | None) -> str | None:
     m = re.sub(r"\s+", " ", m).strip()
     return m or None
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def get_display_name(model: str | None) -> str | None:
     """Return a user-friendly display name for a normalized model name."""
     if not model:
@@ -202,6 +213,7 @@ def get_display_name(model: str | None) -> str | None:
 
     return " ".join(tokens)
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def model_base(model: str | None) -> str | None:
     """Get the base model name by removing trim levels and normalizing common variants"""
     m = normalize_model(model)
@@ -245,6 +257,7 @@ def model_base(model: str | None) -> str | None:
     
     return result
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE * 2)
 def normalize_title(title: str | None) -> str | None:
     if not title:
         return None